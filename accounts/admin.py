@@ -6,7 +6,15 @@ from .models import CustomUser
 @admin.register(CustomUser)
 class CustomUserAdmin(BaseUserAdmin):
     model = CustomUser
-    list_display = ("id", "email", "username", "plan", "is_active", "is_staff")
+    list_display = (
+        "id",
+        "email",
+        "username",
+        "plan",
+        "storage_used",
+        "is_active",
+        "is_staff",
+    )
     list_filter = ("is_staff", "is_active", "plan")
     search_fields = ("email", "username")
     ordering = ("email",)
@@ -24,8 +32,9 @@ class CustomUserAdmin(BaseUserAdmin):
                 )
             },
         ),
-        ("Подписка", {"fields": ("plan",)}),
+        ("Подписка", {"fields": ("plan", "storage_used")}),
     )
+    readonly_fields = ("storage_used",)
     add_fieldsets = (
         (
             None,
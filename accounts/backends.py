@@ -1,19 +1,43 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+
+from .throttling import (
+    is_login_throttled,
+    register_login_failure,
+    reset_login_failures,
+)
 
 User = get_user_model()
 
 
 class EmailOrUsernameBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(email=username)
-        except User.DoesNotExist:
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return None
+        if username is None:
+            # authenticate(email=...) после регистрации.
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        if is_login_throttled(request, username):
+            # PermissionDenied останавливает перебор остальных бэкендов.
+            raise PermissionDenied
 
-        if user.check_password(password) and self.user_can_authenticate(user):
+        # Один запрос по двум индексам: UPPER(email) и username.
+        users = list(
+            User.objects.filter(Q(email__iexact=username) | Q(username=username))[:2]
+        )
+        # Если строка совпала с почтой одного и ником другого, почта важнее.
+        user = next(
+            (user for user in users if user.email.lower() == username.lower()),
+            users[0] if users else None,
+        )
+        if user is None:
+            # Хешируем пароль впустую, чтобы несуществующий логин отвечал так
+            # же долго, как существующий, и перебор не был дешевле.
+            User().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            reset_login_failures(request, username)
             return user
+        register_login_failure(request, username)
         return None
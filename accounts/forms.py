@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
 from .models import CustomUser
+from .throttling import is_login_throttled
 
 
 class RegisterForm(forms.ModelForm):
@@ -112,8 +113,17 @@ class CustomAuthenticationForm(AuthenticationForm):
 
     error_messages = {
         "invalid_login": "Неверная почта/ник-нейм или пароль. Проверьте правильность введенных данных.",
+        "throttled": "Слишком много неудачных попыток входа. Попробуйте позже.",
     }
 
+    def clean(self):
+        username = self.cleaned_data.get("username")
+        if username and is_login_throttled(self.request, username):
+            raise forms.ValidationError(
+                self.error_messages["throttled"], code="throttled"
+            )
+        return super().clean()
+
     class Meta:
         model = CustomUser
         fields = ("username", "password")
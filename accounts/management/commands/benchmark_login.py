@@ -0,0 +1,96 @@
+import random
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from accounts.throttling import clear_login_failures
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput under a credential-stuffing load "
+        "(temporary users, rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--attempts", type=int, default=200)
+        parser.add_argument(
+            "--ips", type=int, default=5, help="Number of attacking client addresses"
+        )
+        parser.add_argument(
+            "--existing-ratio",
+            type=float,
+            default=0.5,
+            help="Share of attempts that target existing accounts",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        User = get_user_model()
+        # С пустым паролем check_password() возвращается, не вызывая хешер,
+        # и попытки на существующие аккаунты ничего бы не измеряли.
+        password = make_password("bench-password")
+        users = User.objects.bulk_create(
+            User(email=f"bench{i}@example.com", username=f"bench{i}", password=password)
+            for i in range(options["users"])
+        )
+        factory = RequestFactory()
+        rng = random.Random(0)
+        attempts = []
+        for i in range(options["attempts"]):
+            if rng.random() < options["existing_ratio"]:
+                login = rng.choice(users).email.upper()
+            else:
+                login = f"nobody{i}@example.com"
+            request = factory.post("/accounts/login/")
+            request.META["REMOTE_ADDR"] = f"198.18.0.{i % options['ips'] + 1}"
+            attempts.append((request, login))
+
+        unlimited = {
+            "LOGIN_THROTTLE_IP_LIMIT": 10**9,
+            "LOGIN_THROTTLE_ACCOUNT_LIMIT": 10**9,
+        }
+        try:
+            for label, limits in (
+                ("without throttle", unlimited),
+                ("with throttle", {}),
+            ):
+                self.clear_failures(attempts)
+                with override_settings(**limits):
+                    self.bench(label, attempts)
+        finally:
+            # Счетчики лежат в кэше и переживут откат транзакции.
+            self.clear_failures(attempts)
+
+    def clear_failures(self, attempts):
+        for request, login in attempts:
+            clear_login_failures(request, login)
+
+    def bench(self, label, attempts):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for request, login in attempts:
+                authenticate(request, username=login, password="wrong-password")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label}: {len(attempts)} attempts in {elapsed:.2f}s "
+            f"({len(attempts) / elapsed:.1f}/s), "
+            f"{len(queries) / len(attempts):.2f} queries per attempt"
+        )
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired database sessions in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not settings.SESSION_ENGINE.endswith((".db", ".cached_db")):
+            # Кэш и подписанные cookie истекают сами, чистить нечего.
+            self.stdout.write(f"Nothing to purge for {settings.SESSION_ENGINE}")
+            return
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Короткие DELETE по первичному ключу не держат долгих блокировок,
+            # в отличие от одного clearsessions на всю таблицу.
+            batch = list(
+                Session.objects.filter(expire_date__lt=now).values_list(
+                    "pk", flat=True
+                )[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            deleted += Session.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions"))
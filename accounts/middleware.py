@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+REFRESHED_AT_KEY = "_refreshed_at"
+
+
+class SessionRefreshMiddleware(MiddlewareMixin):
+    """
+    Продлевает срок сессии не на каждом запросе, а когда с последнего
+    сохранения прошла доля SESSION_REFRESH_FRACTION от SESSION_COOKIE_AGE.
+    Сессия по-прежнему истекает после простоя не дольше SESSION_COOKIE_AGE,
+    но запись в хранилище и новая cookie нужны раз в несколько запросов.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, "session", None)
+        if session is None or session.is_empty():
+            return response
+        now = int(time.time())
+        if session.modified:
+            # Сессия и так будет сохранена — запоминаем момент сохранения.
+            session[REFRESHED_AT_KEY] = now
+            return response
+        interval = settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION
+        if now - session.get(REFRESHED_AT_KEY, 0) >= interval:
+            session[REFRESHED_AT_KEY] = now
+        return response
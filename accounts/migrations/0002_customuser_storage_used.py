@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:21
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_storage_used(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    UploadFile = apps.get_model("uploader", "UploadFile")
+    usage = (
+        UploadFile.objects.filter(user=OuterRef("pk"))
+        .values("user")
+        .annotate(total=Sum("size"))
+        .values("total")
+    )
+    CustomUser.objects.update(storage_used=Coalesce(Subquery(usage), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("uploader", "0006_uploadfile_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="customuser",
+            options={"verbose_name": "User", "verbose_name_plural": "Users"},
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="storage_used",
+            field=models.BigIntegerField(
+                default=0, verbose_name="Занято в хранилище (байт)"
+            ),
+        ),
+        migrations.RunPython(fill_storage_used, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:29
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_customuser_storage_used"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                django.db.models.functions.text.Upper("email"),
+                name="customuser_email_upper_idx",
+            ),
+        ),
+    ]
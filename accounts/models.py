@@ -4,6 +4,14 @@ from django.contrib.auth.models import (
     BaseUserManager,
 )
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
+
+# Лимиты тарифов: размер одного файла и общий объем хранилища (байт).
+PLAN_LIMITS = {
+    "premium": {"max_file_size": 2 * 1024**3, "storage_quota": 100 * 1024**3},
+    "none": {"max_file_size": 512 * 1024**2, "storage_quota": 5 * 1024**3},
+}
 
 
 class CustomUserManager(BaseUserManager):
@@ -31,6 +39,9 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, username, password, **extra_fields)
 
+    def add_storage_usage(self, user_id, delta):
+        return self.filter(pk=user_id).update(storage_used=F("storage_used") + delta)
+
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
@@ -47,6 +58,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         ),
         default="none",
     )
+    # Денормализованный счетчик: обновляется при загрузке и удалении файлов,
+    # сверяется командой reconcile_storage_usage.
+    storage_used = models.BigIntegerField("Занято в хранилище (байт)", default=0)
 
     objects = CustomUserManager()
 
@@ -59,12 +73,13 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            # Вход по почте без учета регистра (email__iexact -> UPPER(email)).
+            models.Index(Upper("email"), name="customuser_email_upper_idx"),
+        ]
 
-    def max_file_size(self):
-        if self.plan == "premium":
-            return 2 * 1024**3
-        return 512 * 1024**2
+    # Лимиты тарифа — в payment.entitlements (request.entitlement).
 
-    @property
-    def max_file_size_mb(self):
-        return self.max_file_size() // 1024**2
+    def add_storage_usage(self, delta):
+        CustomUser.objects.add_storage_usage(self.pk, delta)
+        self.storage_used += delta
@@ -1,3 +1,162 @@
-from django.test import TestCase
+import io
+import time
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .middleware import REFRESHED_AT_KEY
+from .models import CustomUser
+
+LOGIN_URL = "/accounts/login/"
+THROTTLED = "Слишком много неудачных попыток входа"
+
+
+@override_settings(LOGIN_THROTTLE_ACCOUNT_LIMIT=3, LOGIN_THROTTLE_IP_LIMIT=5)
+class LoginThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="alice@example.com", username="alice", password="correct"
+        )
+
+    def setUp(self):
+        # Счетчики живут в кэше, а не в транзакции теста.
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def login(self, password, username="alice", ip="10.0.0.1"):
+        self.client.logout()
+        return self.client.post(
+            LOGIN_URL, {"username": username, "password": password}, REMOTE_ADDR=ip
+        )
+
+    def assertLoggedIn(self, response):
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_account_is_locked_after_repeated_failures(self):
+        for _ in range(3):
+            response = self.login("wrong")
+            self.assertContains(response, "Неверная почта/ник-нейм или пароль")
+        # Даже верный пароль и другой IP не помогают, пока окно не истекло;
+        # почта и ник — разные ключи счетчика.
+        self.assertContains(self.login("correct"), THROTTLED)
+        self.assertContains(self.login("correct", ip="10.0.0.2"), THROTTLED)
+        self.assertLoggedIn(self.login("correct", username="alice@example.com"))
+
+    def test_successful_login_resets_account_counter(self):
+        for _ in range(2):
+            self.login("wrong")
+        self.assertLoggedIn(self.login("correct"))
+        for _ in range(2):
+            self.login("wrong")
+        self.assertLoggedIn(self.login("correct"))
+
+    def test_ip_is_locked_across_accounts(self):
+        for i in range(5):
+            self.login("wrong", username=f"guess{i}")
+        self.assertContains(self.login("correct"), THROTTLED)
+        self.assertLoggedIn(self.login("correct", ip="10.0.0.2"))
+        # Успешный вход другого клиента не снимает блокировку с этого IP.
+        self.assertContains(self.login("correct"), THROTTLED)
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.db",
+    SESSION_COOKIE_AGE=300,
+    SESSION_REFRESH_FRACTION=0.2,
+)
+class SessionRefreshTests(TestCase):
+    URL = "/file/stats/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="session@example.com", username="session", password="correct"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def set_refreshed_at(self, value):
+        session = self.client.session
+        session[REFRESHED_AT_KEY] = value
+        session.save()
+
+    def get(self):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        with mock.patch.object(
+            store, "save", autospec=True, side_effect=store.save
+        ) as save:
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        return response, save.call_count
+
+    def test_request_within_the_interval_does_not_save(self):
+        refreshed_at = int(time.time()) - 30
+        self.set_refreshed_at(refreshed_at)
+        response, saves = self.get()
+        self.assertEqual(saves, 0)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.client.session[REFRESHED_AT_KEY], refreshed_at)
+
+    def test_request_past_the_interval_refreshes(self):
+        # 300 * 0.2 = 60 секунд.
+        self.set_refreshed_at(int(time.time()) - 61)
+        before = int(time.time())
+        response, saves = self.get()
+        self.assertEqual(saves, 1)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertGreaterEqual(self.client.session[REFRESHED_AT_KEY], before)
+
+    def test_session_modified_in_view_is_stamped(self):
+        self.set_refreshed_at(int(time.time()) - 10)
+        self.client.logout()
+        before = int(time.time())
+        response = self.client.post(
+            "/accounts/login/", {"username": "session", "password": "correct"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertGreaterEqual(self.client.session[REFRESHED_AT_KEY], before)
+
+
+@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+class PurgeSessionsTests(TestCase):
+    def test_deletes_only_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f"expired{i}",
+                session_data="",
+                expire_date=now - timedelta(minutes=i + 1),
+            )
+        for i in range(2):
+            Session.objects.create(
+                session_key=f"active{i}",
+                session_data="",
+                expire_date=now + timedelta(minutes=5),
+            )
+        out = io.StringIO()
+        call_command("purge_sessions", "--batch-size=2", stdout=out)
+        self.assertIn("Deleted 5 expired sessions", out.getvalue())
+        self.assertEqual(
+            sorted(Session.objects.values_list("session_key", flat=True)),
+            ["active0", "active1"],
+        )
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cache")
+    def test_cache_sessions_are_left_alone(self):
+        Session.objects.create(
+            session_key="expired", session_data="", expire_date=timezone.now()
+        )
+        out = io.StringIO()
+        call_command("purge_sessions", stdout=out)
+        self.assertIn("Nothing to purge", out.getvalue())
+        self.assertTrue(Session.objects.exists())
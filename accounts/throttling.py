@@ -0,0 +1,52 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _client_ip(request):
+    # За прокси REMOTE_ADDR должен выставлять сам прокси (например, через
+    # ProxyFix/realip nginx), X-Forwarded-For от клиента не доверяем.
+    if request is None:
+        return ""
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _counters(request, username):
+    account = hashlib.sha256(username.strip().lower().encode()).hexdigest()
+    counters = [
+        (f"login-fail:account:{account}", settings.LOGIN_THROTTLE_ACCOUNT_LIMIT)
+    ]
+    ip = _client_ip(request)
+    if ip:
+        counters.append((f"login-fail:ip:{ip}", settings.LOGIN_THROTTLE_IP_LIMIT))
+    return counters
+
+
+def is_login_throttled(request, username):
+    """Превышен ли лимит неудачных входов для этого IP или аккаунта."""
+    counters = _counters(request, username)
+    failures = cache.get_many([key for key, _ in counters])
+    return any(failures.get(key, 0) >= limit for key, limit in counters)
+
+
+def register_login_failure(request, username):
+    for key, _ in _counters(request, username):
+        cache.add(key, 0, settings.LOGIN_THROTTLE_WINDOW)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Счетчик истек между add() и incr().
+            cache.set(key, 1, settings.LOGIN_THROTTLE_WINDOW)
+
+
+def reset_login_failures(request, username):
+    # Счетчик IP не сбрасываем: успешный вход с одного аккаунта не должен
+    # обнулять перебор по остальным.
+    account_key, _ = _counters(request, username)[0]
+    cache.delete(account_key)
+
+
+def clear_login_failures(request, username):
+    """Сбрасывает оба счетчика, аккаунта и IP (для benchmark_login)."""
+    cache.delete_many([key for key, _ in _counters(request, username)])
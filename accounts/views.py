@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import RegisterForm, CustomAuthenticationForm
 from django.utils.translation import gettext_lazy as _
+from uploader.models import UserFileStats
 
 
 def register(request):
@@ -47,4 +48,7 @@ def user_logout(request):
 
 @login_required
 def profile(request):
-    return render(request, "accounts/profile.html", {"user": request.user})
+    stats = UserFileStats.objects.for_user(request.user).as_dict()
+    return render(
+        request, "accounts/profile.html", {"user": request.user, "stats": stats}
+    )
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundQueue:
+    """
+    Пул потоков в процессе веб-сервера для работы после коммита: превью,
+    индексация, сборка удаленных файлов, вебхуки. Размер пула берется из
+    настройки workers_setting; 0 — работу выполняет только команда.
+    """
+
+    def __init__(self, name, workers_setting, max_workers=None):
+        self.name = name
+        self.workers_setting = workers_setting
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, self.workers_setting) > 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers
+                    or getattr(settings, self.workers_setting),
+                    thread_name_prefix=self.name,
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        close_old_connections()
+        try:
+            func(*args)
+        except Exception:
+            # Исключение в пуле иначе осело бы в Future и потерялось.
+            logger.exception("Фоновая задача %s завершилась с ошибкой", self.name)
+        finally:
+            close_old_connections()
+
+    def submit(self, func, *args):
+        """Выполняет func(*args) в пуле после коммита текущей транзакции."""
+        self.map(func, [args])
+
+    def map(self, func, args_list):
+        """Как submit(), но для нескольких наборов аргументов сразу."""
+        args_list = list(args_list)
+        if not args_list or not self.enabled:
+            return
+
+        def start():
+            executor = self._get_executor()
+            for args in args_list:
+                executor.submit(self._run, func, *args)
+
+        # Воркеры стартуют только после коммита, иначе они не увидят строки.
+        transaction.on_commit(start)
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Команда, которая разбирает очередь пачками: один проход или, с --loop,
+    постоянный опрос с паузой --interval, пока новой работы нет.
+    """
+
+    batch_size = 100
+    interval = 5.0
+    loop_help = "Keep polling for new work (worker mode)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=self.batch_size)
+        parser.add_argument("--loop", action="store_true", help=self.loop_help)
+        parser.add_argument("--interval", type=float, default=self.interval)
+
+    def handle(self, *args, **options):
+        self.prepare(options)
+        while True:
+            processed = self.process(options["batch_size"])
+            if not options["loop"]:
+                break
+            if not processed:
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def prepare(self, options):
+        """Разовая подготовка перед первым проходом."""
+
+    def process(self, batch_size):
+        """Разбирает накопившуюся работу; возвращает число обработанных записей."""
+        raise NotImplementedError
+
+    def process_each(self, queryset, func, batch_size):
+        """
+        Вызывает func(pk) для записей queryset по возрастанию pk. Курсор по pk
+        не дает зациклиться на записях, занятых другим воркером.
+        """
+        processed = 0
+        last_pk = None
+        while True:
+            batch = queryset.order_by("pk")
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                return processed
+            for pk in batch:
+                func(pk)
+            last_pk = batch[-1]
+            processed += len(batch)
@@ -44,6 +44,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.SessionRefreshMiddleware",
+    "payment.middleware.EntitlementMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -66,6 +68,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "fileflow.wsgi.application"
+ASGI_APPLICATION = "fileflow.asgi.application"
+
+# Асинхронные представления списков, просмотра и скачивания файлов
+# (включайте при запуске под ASGI-сервером: uvicorn, daphne).
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -107,9 +114,14 @@ AUTH_PASSWORD_VALIDATORS = [
 # Кастомный бэкенд для аутентификации.
 AUTHENTICATION_BACKENDS = [
     "accounts.backends.EmailOrUsernameBackend",
-    "django.contrib.auth.backends.ModelBackend",
 ]
 
+# Ограничение неудачных входов (accounts.throttling): число попыток за окно
+# в секундах с одного IP и для одного аккаунта.
+LOGIN_THROTTLE_WINDOW = int(os.getenv("LOGIN_THROTTLE_WINDOW", 15 * 60))
+LOGIN_THROTTLE_IP_LIMIT = int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", 20))
+LOGIN_THROTTLE_ACCOUNT_LIMIT = int(os.getenv("LOGIN_THROTTLE_ACCOUNT_LIMIT", 5))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -134,23 +146,177 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Хранилище загруженных файлов: "filesystem" (MEDIA_ROOT на этом сервере) или
+# "s3" (S3-совместимое объектное хранилище — AWS S3, MinIO и т. п.), общее для
+# всех серверов приложения.
+FILE_STORAGE = os.getenv("FILE_STORAGE", "filesystem")
+# Имена файлов уникальны по построению (uploader.models), поэтому хранилище
+# не перебирает свободные имена через exists(), а пишет по готовому пути.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"allow_overwrite": True},
+    },
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+if FILE_STORAGE == "s3":
+    STORAGES["default"] = {
+        "BACKEND": "uploader.storage.S3Storage",
+        "OPTIONS": {
+            "bucket_name": os.getenv("S3_BUCKET"),
+            "endpoint_url": os.getenv("S3_ENDPOINT_URL") or None,
+            "region_name": os.getenv("S3_REGION") or None,
+            "access_key": os.getenv("S3_ACCESS_KEY_ID"),
+            "secret_key": os.getenv("S3_SECRET_ACCESS_KEY"),
+            "location": os.getenv("S3_LOCATION", ""),
+            "addressing_style": os.getenv("S3_ADDRESSING_STYLE") or None,
+            # Сколько секунд действует подписанная ссылка на скачивание.
+            "querystring_expire": int(os.getenv("S3_URL_EXPIRE", 300)),
+            "multipart_threshold": int(
+                os.getenv("S3_MULTIPART_THRESHOLD", 16 * 1024 * 1024)
+            ),
+            "multipart_chunksize": int(
+                os.getenv("S3_MULTIPART_CHUNKSIZE", 16 * 1024 * 1024)
+            ),
+        },
+    }
+
+# Обработчики загрузки считают SHA-256, размер и тип файла за один проход.
+FILE_UPLOAD_HANDLERS = [
+    "uploader.handlers.InspectingMemoryFileUploadHandler",
+    "uploader.handlers.InspectingTemporaryFileUploadHandler",
+]
+
+# Сжатие хорошо сжимаемых файлов (текст, CSV, JSON, XML, старые форматы Office)
+# при загрузке: "" — выключено, "gzip" или "zstd" (нужен пакет zstandard).
+# Файл хранится сжатым, только если занимает не больше MAX_RATIO от исходного.
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION", "")
+UPLOAD_COMPRESSION_MIN_SIZE = int(os.getenv("UPLOAD_COMPRESSION_MIN_SIZE", 1024))
+UPLOAD_COMPRESSION_MAX_RATIO = float(os.getenv("UPLOAD_COMPRESSION_MAX_RATIO", 0.9))
+
+# Загрузка по частям: недокачанные файлы лежат вне MEDIA_ROOT до завершения.
+FILE_UPLOAD_STAGING_DIR = os.getenv("FILE_UPLOAD_STAGING_DIR", BASE_DIR / "staging")
+FILE_UPLOAD_CHUNK_MAX_SIZE = int(
+    os.getenv("FILE_UPLOAD_CHUNK_MAX_SIZE", 64 * 1024 * 1024)
+)
+# Через сколько секунд без новых частей загрузка считается брошенной: ее
+# строку и staging-файл удаляет очистка хранилища (reap_storage).
+FILE_UPLOAD_CHUNKED_EXPIRY = int(os.getenv("FILE_UPLOAD_CHUNKED_EXPIRY", 24 * 60 * 60))
+
+# Пакетная загрузка: сколько файлов (и полей с их путями) принимать за запрос.
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv("DATA_UPLOAD_MAX_NUMBER_FILES", 1000))
+DATA_UPLOAD_MAX_NUMBER_FIELDS = DATA_UPLOAD_MAX_NUMBER_FILES + 100
+
+# Сколько файлов показывать на одной странице списка (дальше — подгрузка).
+FILE_LIST_PAGE_SIZE = int(os.getenv("FILE_LIST_PAGE_SIZE", 50))
+
+# Отдача файлов: "django" (поток через воркер), "sendfile" (os.sendfile через
+# wsgi.file_wrapper), "x-accel-redirect" (nginx), "x-sendfile" (Apache/lighttpd)
+# или "presigned-redirect" (перенаправление на подписанную ссылку, FILE_STORAGE=s3).
+DOWNLOAD_BACKEND = os.getenv("DOWNLOAD_BACKEND", "django")
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.getenv(
+    "DOWNLOAD_ACCEL_REDIRECT_PREFIX", "/protected-media/"
+)
+DOWNLOAD_BLOCK_SIZE = int(os.getenv("DOWNLOAD_BLOCK_SIZE", 1024 * 1024))
+
+# Превью строятся в фоне: размер миниатюр, объем текстового фрагмента и число
+# потоков в процессе веб-сервера (0 — превью строит только generate_previews).
+PREVIEW_MAX_SIZE = int(os.getenv("PREVIEW_MAX_SIZE", 640))
+PREVIEW_TEXT_BYTES = int(os.getenv("PREVIEW_TEXT_BYTES", 4096))
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", 2))
+
+# Поиск по файлам (uploader.search): конфигурация полнотекстового поиска
+# PostgreSQL, сколько байт текста индексировать, потоки индексации
+# (0 — только командой index_files), размер страницы и предел совпадений.
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "russian")
+SEARCH_TEXT_MAX_BYTES = int(os.getenv("SEARCH_TEXT_MAX_BYTES", 256 * 1024))
+SEARCH_INDEX_WORKERS = int(os.getenv("SEARCH_INDEX_WORKERS", 1))
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 500))
+
+# Сколько самых больших файлов хранить в статистике пользователя.
+STATS_LARGEST_FILES = int(os.getenv("STATS_LARGEST_FILES", 10))
+
+# Удаление файлов из хранилища идет после коммита фоновым потоком;
+# 0 — только командой reap_storage.
+STORAGE_REAPER_WORKERS = int(os.getenv("STORAGE_REAPER_WORKERS", 1))
+STORAGE_REAPER_BATCH_SIZE = int(os.getenv("STORAGE_REAPER_BATCH_SIZE", 500))
+
 # Кастомная модель авторизации
 AUTH_USER_MODEL = "accounts.CustomUser"
 
+# Сколько секунд хранить в кэше вычисленный тариф пользователя
+# (сбрасывается явно при оплате и по вебхуку Stripe).
+ENTITLEMENT_CACHE_TIMEOUT = int(os.getenv("ENTITLEMENT_CACHE_TIMEOUT", 300))
+
 # Платежки
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLIC_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+# Клиент Stripe (payment.gateway): таймауты в секундах, повторы при сетевых
+# сбоях и размыкатель цепи. PAYMENT_GATEWAY=payment.gateway.FakeGateway
+# подменяет Stripe локальной заглушкой.
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "payment.gateway.StripeGateway")
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", 3))
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", 10))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", 2))
+STRIPE_POOL_SIZE = int(os.getenv("STRIPE_POOL_SIZE", 10))
+STRIPE_CIRCUIT_FAILURES = int(os.getenv("STRIPE_CIRCUIT_FAILURES", 5))
+STRIPE_CIRCUIT_RESET = float(os.getenv("STRIPE_CIRCUIT_RESET", 30))
+# Вебхуки Stripe применяются в фоне; 0 — только командой process_stripe_events.
+STRIPE_EVENT_WORKERS = int(os.getenv("STRIPE_EVENT_WORKERS", 1))
 
 # Логин/выход
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
 
+# Кэш: Redis, если задан REDIS_URL, иначе память процесса (только для
+# разработки — у каждого воркера свой кэш). Префикс отделяет окружения в
+# одном Redis, а увеличение CACHE_VERSION при деплое сбрасывает старые записи.
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "fileflow")
+CACHE_VERSION = int(os.getenv("CACHE_VERSION", 1))
+
+if REDIS_URL:
+    CACHE_BACKEND = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "OPTIONS": {"socket_connect_timeout": 1, "socket_timeout": 1},
+    }
+else:
+    CACHE_BACKEND = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+CACHES = {
+    # Тарифы (payment.entitlements), счетчики неудачных входов (accounts.throttling).
+    "default": {
+        **CACHE_BACKEND,
+        "LOCATION": CACHE_BACKEND.get("LOCATION", "default"),
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        "VERSION": CACHE_VERSION,
+    },
+    # Сессии не зависят от CACHE_VERSION, чтобы деплой не разлогинивал всех.
+    "sessions": {
+        **CACHE_BACKEND,
+        "LOCATION": CACHE_BACKEND.get("LOCATION", "sessions"),
+        "KEY_PREFIX": f"{CACHE_KEY_PREFIX}:sessions",
+        "TIMEOUT": None,
+    },
+}
+
 # Сессии
+# Хранилище: "db", "cached_db", "cache" (Redis) или "signed_cookies" (данные
+# в подписанной cookie, без записи на сервере). С Redis по умолчанию "cache".
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cache" if REDIS_URL else "db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+SESSION_CACHE_ALIAS = "sessions"
 SESSION_COOKIE_AGE = 5 * 60
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-SESSION_SAVE_EVERY_REQUEST = True
+# Вместо сохранения на каждый запрос срок сессии продлевает
+# accounts.middleware.SessionRefreshMiddleware, когда прошла эта доля
+# SESSION_COOKIE_AGE с последнего сохранения.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = float(os.getenv("SESSION_REFRESH_FRACTION", 0.2))
 
 # Защита CSRF, Cookies и сессий.
 CSRF_COOKIE_SECURE = True
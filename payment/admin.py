@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, UserSubscription
+from .models import StripeEvent, SubscriptionPlan, UserSubscription
 
 
 @admin.register(SubscriptionPlan)
@@ -13,3 +13,18 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
     list_display = ["user", "plan", "status", "is_active", "start_date", "end_date"]
     list_filter = ["status", "is_active"]
     search_fields = ["user__username"]
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ["event_id", "type", "status", "received_at", "processed_at"]
+    list_filter = ["status", "type"]
+    search_fields = ["event_id"]
+    readonly_fields = [
+        "event_id",
+        "type",
+        "payload",
+        "error",
+        "received_at",
+        "processed_at",
+    ]
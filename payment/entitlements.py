@@ -0,0 +1,103 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounts.models import PLAN_LIMITS
+from .models import UserSubscription
+
+PLAN_DISPLAY = {"premium": "Премиум", "none": "Нет подписки"}
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """
+    Действующий тариф пользователя и его лимиты. Считается один раз и
+    хранится в кэше, пока его не сбросит invalidate_entitlement().
+    """
+
+    plan: str
+    is_superuser: bool = False
+    plan_name: str = ""
+    expires_at: datetime | None = None
+    max_file_size: int = PLAN_LIMITS["none"]["max_file_size"]
+    storage_quota: int = PLAN_LIMITS["none"]["storage_quota"]
+
+    @property
+    def plan_display(self):
+        return PLAN_DISPLAY[self.plan]
+
+    @property
+    def is_premium(self):
+        return self.plan == "premium"
+
+    @property
+    def is_subscribed(self):
+        # Есть оплаченная подписка с датой окончания (а не тариф, выданный вручную).
+        return self.expires_at is not None
+
+    @property
+    def max_file_size_mb(self):
+        return self.max_file_size // 1024**2
+
+    def storage_left(self, user):
+        return max(self.storage_quota - user.storage_used, 0)
+
+    def has_storage_for(self, user, size):
+        return user.storage_used + size <= self.storage_quota
+
+    @property
+    def days_remaining(self):
+        if self.is_superuser:
+            return "∞"
+        if self.expires_at:
+            # Между окончанием подписки и запуском expire_subscriptions.
+            return max((self.expires_at - timezone.now()).days, 0)
+        return 30 if self.is_premium else 0
+
+
+ANONYMOUS = Entitlement(plan="none")
+
+
+def _cache_key(user_id):
+    return f"entitlement:{user_id}"
+
+
+def resolve_entitlement(user):
+    # Тариф определяется флагом user.plan: истекшие подписки снимает команда
+    # expire_subscriptions, поэтому даты здесь не сравниваются.
+    plan = "premium" if user.is_superuser or user.plan == "premium" else "none"
+    subscription = (
+        UserSubscription.objects.select_related("plan")
+        .filter(user=user, is_active=True)
+        .first()
+    )
+    return Entitlement(
+        plan=plan,
+        is_superuser=user.is_superuser,
+        plan_name=subscription.plan.name if subscription else "",
+        expires_at=subscription.end_date if subscription else None,
+        **PLAN_LIMITS[plan],
+    )
+
+
+def get_entitlement(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = _cache_key(user.pk)
+    data = cache.get(key)
+    if data is not None:
+        return Entitlement(**data)
+    entitlement = resolve_entitlement(user)
+    cache.set(key, asdict(entitlement), settings.ENTITLEMENT_CACHE_TIMEOUT)
+    return entitlement
+
+
+def invalidate_entitlement(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_entitlements(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,75 @@
+import json
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from fileflow.background import BackgroundQueue
+
+from .models import StripeEvent
+from .services import activate_subscription
+
+logger = logging.getLogger(__name__)
+
+queue = BackgroundQueue("stripe", "STRIPE_EVENT_WORKERS")
+
+
+def _checkout_completed(session):
+    if session.get("payment_status") != "paid":
+        # Отложенные способы оплаты придут отдельным событием async_payment_succeeded.
+        return
+    metadata = session.get("metadata") or {}
+    activate_subscription(metadata["user_id"], metadata["plan_id"])
+
+
+EVENT_HANDLERS = {
+    "checkout.session.completed": _checkout_completed,
+    "checkout.session.async_payment_succeeded": _checkout_completed,
+}
+
+
+def record_event(payload):
+    """
+    Сохраняет проверенное событие в журнал и ставит его в очередь. Возвращает
+    None, если событие с таким ID уже было получено.
+    """
+    data = json.loads(payload)
+    try:
+        with transaction.atomic():
+            event = StripeEvent.objects.create(
+                event_id=data["id"], type=data["type"], payload=data
+            )
+    except IntegrityError:
+        return None
+    queue.submit(process_event, event.pk)
+    return event
+
+
+def apply_event(event):
+    handler = EVENT_HANDLERS.get(event.type)
+    if handler is not None:
+        handler(event.payload["data"]["object"])
+
+
+def process_event(event_pk):
+    with transaction.atomic():
+        # skip_locked: событие уже обрабатывает другой воркер.
+        event = (
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(pk=event_pk, status=StripeEvent.STATUS_PENDING)
+            .first()
+        )
+        if event is None:
+            return
+        try:
+            with transaction.atomic():
+                apply_event(event)
+        except Exception as e:
+            logger.exception("Не удалось обработать событие %s", event.event_id)
+            event.status = StripeEvent.STATUS_FAILED
+            event.error = str(e)[:255]
+        else:
+            event.status = StripeEvent.STATUS_PROCESSED
+            event.error = ""
+        event.processed_at = timezone.now()
+        event.save(update_fields=["status", "error", "processed_at"])
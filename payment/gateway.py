@@ -0,0 +1,126 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+import shortuuid
+import stripe
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+
+class PaymentGatewayUnavailable(Exception):
+    """Платежный сервис недоступен или не ответил вовремя."""
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold сбоев подряд перестает пропускать вызовы на
+    reset_timeout секунд, затем снова пропускает их, но первый же сбой опять
+    размыкает цепь. Пока цепь разомкнута, запросы отклоняются сразу и не
+    занимают воркер ожиданием таймаута.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise PaymentGatewayUnavailable("Платежный сервис временно недоступен")
+            # Полуоткрытое состояние: следующий сбой снова размыкает цепь.
+            self.opened_at = None
+            self.failures = self.failure_threshold - 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# Сбои на стороне Stripe или сети; ошибки в параметрах запроса цепь не размыкают.
+TRANSIENT_ERRORS = (stripe.APIConnectionError, stripe.RateLimitError, stripe.APIError)
+
+
+class StripeGateway:
+    def __init__(self):
+        session = requests.Session()
+        # Один пул keep-alive соединений на процесс вместо нового TLS-рукопожатия
+        # на каждый вызов.
+        session.mount("https://", HTTPAdapter(pool_maxsize=settings.STRIPE_POOL_SIZE))
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=stripe.RequestsClient(
+                timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_TIMEOUT),
+                session=session,
+            ),
+            # Повторы с экспоненциальной задержкой и идемпотентными ключами.
+            max_network_retries=settings.STRIPE_MAX_RETRIES,
+        )
+        self.breaker = CircuitBreaker(
+            settings.STRIPE_CIRCUIT_FAILURES, settings.STRIPE_CIRCUIT_RESET
+        )
+
+    def _call(self, method, params):
+        self.breaker.before_call()
+        try:
+            result = method(params)
+        except TRANSIENT_ERRORS as e:
+            self.breaker.record_failure()
+            raise PaymentGatewayUnavailable(str(e)) from e
+        self.breaker.record_success()
+        return result
+
+    def create_checkout_session(self, **params):
+        return self._call(self.client.v1.checkout.sessions.create, params)
+
+    def create_product(self, **params):
+        return self._call(self.client.v1.products.create, params)
+
+    def create_price(self, **params):
+        return self._call(self.client.v1.prices.create, params)
+
+
+class FakeGateway:
+    """Локальная замена Stripe для тестов и разработки: запоминает вызовы."""
+
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, name, params, **fields):
+        self.calls.append((name, params))
+        return SimpleNamespace(id=f"{name}_{shortuuid.uuid()}", **fields)
+
+    def create_checkout_session(self, **params):
+        return self._record("cs", params, url=params["success_url"])
+
+    def create_product(self, **params):
+        return self._record("prod", params)
+
+    def create_price(self, **params):
+        return self._record("price", params)
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Общий на процесс экземпляр шлюза из настройки PAYMENT_GATEWAY."""
+    global _gateway
+    gateway_class = import_string(settings.PAYMENT_GATEWAY)
+    if not isinstance(_gateway, gateway_class):
+        _gateway = gateway_class()
+    return _gateway
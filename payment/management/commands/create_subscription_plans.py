@@ -1,10 +1,7 @@
 from django.core.management.base import BaseCommand
-import stripe
-from django.conf import settings
+from payment.gateway import get_gateway
 from payment.models import SubscriptionPlan
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 
 class Command(BaseCommand):
     help = "Create subscription plans in Stripe and database"
@@ -21,12 +18,13 @@ class Command(BaseCommand):
 
         if created or not plan.stripe_price_id:
             try:
-                product = stripe.Product.create(
+                gateway = get_gateway()
+                product = gateway.create_product(
                     name=plan.name,
                     description=plan.description,
                 )
 
-                price = stripe.Price.create(
+                price = gateway.create_price(
                     product=product.id,
                     unit_amount=int(plan.price * 100),
                     currency="usd",
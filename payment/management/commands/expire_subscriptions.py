@@ -0,0 +1,20 @@
+from fileflow.background import WorkerCommand
+from payment.services import expire_subscriptions
+
+
+class Command(WorkerCommand):
+    help = "Deactivate subscriptions past their end date and downgrade their users"
+    batch_size = 500
+    interval = 60.0
+    loop_help = "Keep checking for expired subscriptions (worker mode)"
+
+    def process(self, batch_size):
+        expired = 0
+        while True:
+            count = expire_subscriptions(batch_size)
+            expired += count
+            if count < batch_size:
+                break
+        if expired:
+            self.stdout.write(f"Expired {expired} subscriptions")
+        return expired
@@ -0,0 +1,33 @@
+from fileflow.background import WorkerCommand
+from payment.events import process_event
+from payment.models import StripeEvent
+
+
+class Command(WorkerCommand):
+    help = "Apply pending Stripe webhook events from the event ledger"
+    loop_help = "Keep polling for new pending events (worker mode)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Queue failed events for another attempt",
+        )
+
+    def prepare(self, options):
+        if options["retry_failed"]:
+            queued = StripeEvent.objects.filter(
+                status=StripeEvent.STATUS_FAILED
+            ).update(status=StripeEvent.STATUS_PENDING)
+            self.stdout.write(f"Queued {queued} failed events")
+
+    def process(self, batch_size):
+        processed = self.process_each(
+            StripeEvent.objects.filter(status=StripeEvent.STATUS_PENDING),
+            process_event,
+            batch_size,
+        )
+        if processed:
+            self.stdout.write(f"Processed {processed} events")
+        return processed
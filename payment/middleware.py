@@ -0,0 +1,11 @@
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .entitlements import get_entitlement
+
+
+class EntitlementMiddleware(MiddlewareMixin):
+    """Добавляет request.entitlement; тариф вычисляется при первом обращении."""
+
+    def process_request(self, request):
+        request.entitlement = SimpleLazyObject(lambda: get_entitlement(request.user))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0002_stripeevent"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="usersubscription",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["end_date"],
+                name="usersubscription_expiry_idx",
+            ),
+        ),
+    ]
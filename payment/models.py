@@ -30,6 +30,16 @@ class UserSubscription(models.Model):
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Очередь expire_subscriptions: только действующие подписки.
+            models.Index(
+                fields=["end_date"],
+                name="usersubscription_expiry_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.plan.name}"
 
@@ -39,3 +49,40 @@ class UserSubscription(models.Model):
                 days=self.plan.duration_days
             )
         super().save(*args, **kwargs)
+
+
+class StripeEvent(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSED = "processed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Ожидает обработки"),
+        (STATUS_PROCESSED, "Обработано"),
+        (STATUS_FAILED, "Ошибка"),
+    )
+
+    # Уникальный ID события Stripe: повторная доставка того же события
+    # не создает вторую запись и не применяется дважды.
+    event_id = models.CharField("ID события", max_length=255, unique=True)
+    type = models.CharField("Тип", max_length=100)
+    payload = models.JSONField("Данные")
+    status = models.CharField(
+        "Статус", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    error = models.CharField("Ошибка", max_length=255, blank=True)
+    received_at = models.DateTimeField("Получено", auto_now_add=True)
+    processed_at = models.DateTimeField("Обработано", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Событие Stripe"
+        verbose_name_plural = "События Stripe"
+        indexes = [
+            models.Index(
+                fields=["id"],
+                name="stripeevent_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .entitlements import invalidate_entitlement, invalidate_entitlements
+from .models import SubscriptionPlan, UserSubscription
+
+
+def activate_subscription(user_id, plan_id):
+    """
+    Включает (или продлевает) подписку пользователя на тариф. Повторный вызов
+    с теми же данными безопасен: у пользователя одна запись UserSubscription.
+    """
+    plan = SubscriptionPlan.objects.get(pk=plan_id)
+    with transaction.atomic():
+        subscription, _ = UserSubscription.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                "plan": plan,
+                "status": "active",
+                "is_active": True,
+                "end_date": timezone.now()
+                + timezone.timedelta(days=plan.duration_days),
+            },
+        )
+        CustomUser.objects.filter(pk=user_id).update(plan="premium")
+        transaction.on_commit(lambda: invalidate_entitlement(user_id))
+    return subscription
+
+
+def expire_subscriptions(batch_size=500):
+    """
+    Снимает одну пачку подписок с истекшим end_date: деактивирует их и
+    переводит владельцев на бесплатный тариф. Возвращает число снятых подписок.
+    """
+    with transaction.atomic():
+        # skip_locked: несколько запусков команды не мешают друг другу.
+        expired = list(
+            UserSubscription.objects.select_for_update(skip_locked=True)
+            .filter(is_active=True, end_date__lt=timezone.now())
+            .order_by("end_date")
+            .values_list("pk", "user_id")[:batch_size]
+        )
+        if not expired:
+            return 0
+        pks = [pk for pk, _ in expired]
+        user_ids = [user_id for _, user_id in expired]
+        UserSubscription.objects.filter(pk__in=pks).update(
+            is_active=False, status="expired"
+        )
+        # Суперпользователи сохраняют премиум без подписки.
+        CustomUser.objects.filter(pk__in=user_ids, is_superuser=False).update(
+            plan="none"
+        )
+        transaction.on_commit(lambda: invalidate_entitlements(user_ids))
+    return len(expired)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .entitlements import invalidate_entitlement
+
+# Поля пользователя, от которых зависит Entitlement.
+ENTITLEMENT_FIELDS = {"plan", "is_superuser"}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_on_user_save(sender, instance, update_fields=None, **kwargs):
+    # Например, last_login при входе на тариф не влияет.
+    if update_fields is not None and not ENTITLEMENT_FIELDS & set(update_fields):
+        return
+    # После коммита: иначе параллельный запрос успел бы закэшировать старый тариф.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_entitlement(user_id))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_on_user_delete(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_entitlement(user_id))
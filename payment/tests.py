@@ -1,3 +1,244 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .entitlements import get_entitlement
+from .events import process_event
+from .gateway import CircuitBreaker, FakeGateway, PaymentGatewayUnavailable, get_gateway
+from .models import StripeEvent, SubscriptionPlan, UserSubscription
+from .services import expire_subscriptions
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def signed_headers(payload, secret=WEBHOOK_SECRET):
+    # Та же схема подписи, что у Stripe: HMAC-SHA256 от "<timestamp>.<payload>".
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return {"HTTP_STRIPE_SIGNATURE": f"t={timestamp},v1={signature}"}
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_EVENT_WORKERS=0)
+class StripeWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="buyer@example.com", username="buyer", password="secret"
+        )
+        cls.plan = SubscriptionPlan.objects.create(
+            name="Basic", description="", price=5, duration_days=30
+        )
+
+    def checkout_event(self, event_id="evt_1", payment_status="paid"):
+        return json.dumps(
+            {
+                "id": event_id,
+                "object": "event",
+                "type": "checkout.session.completed",
+                "data": {
+                    "object": {
+                        "object": "checkout.session",
+                        "payment_status": payment_status,
+                        "metadata": {
+                            "user_id": str(self.user.pk),
+                            "plan_id": str(self.plan.pk),
+                        },
+                    }
+                },
+            }
+        )
+
+    def post_event(self, payload, **headers):
+        return self.client.post(
+            reverse("payment:stripe_webhook"),
+            payload,
+            content_type="application/json",
+            **(headers or signed_headers(payload)),
+        )
+
+    def test_rejects_bad_signature(self):
+        payload = self.checkout_event()
+        response = self.post_event(payload, **signed_headers(payload, "whsec_other"))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_records_event_and_activates_subscription_in_background(self):
+        response = self.post_event(self.checkout_event())
+        self.assertEqual(response.status_code, 200)
+        event = StripeEvent.objects.get(event_id="evt_1")
+        self.assertEqual(event.status, StripeEvent.STATUS_PENDING)
+        self.assertFalse(UserSubscription.objects.filter(user=self.user).exists())
+
+        process_event(event.pk)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, StripeEvent.STATUS_PROCESSED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.plan, "premium")
+        self.assertTrue(UserSubscription.objects.get(user=self.user).is_active)
+
+    def test_redelivered_event_is_applied_once(self):
+        payload = self.checkout_event()
+        self.post_event(payload)
+        self.assertEqual(self.post_event(payload).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        event = StripeEvent.objects.get()
+        process_event(event.pk)
+        process_event(event.pk)
+        self.assertEqual(UserSubscription.objects.filter(user=self.user).count(), 1)
+
+    def test_new_payment_renews_existing_subscription(self):
+        for event_id in ("evt_1", "evt_2"):
+            self.post_event(self.checkout_event(event_id))
+        for event in StripeEvent.objects.all():
+            process_event(event.pk)
+        self.assertEqual(
+            StripeEvent.objects.filter(status=StripeEvent.STATUS_PROCESSED).count(), 2
+        )
+        self.assertEqual(UserSubscription.objects.filter(user=self.user).count(), 1)
+
+    def test_unpaid_checkout_does_not_activate(self):
+        self.post_event(self.checkout_event(payment_status="unpaid"))
+        process_event(StripeEvent.objects.get().pk)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.plan, "none")
+
+
+class ExpireSubscriptionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(
+            name="Basic", description="", price=5, duration_days=30
+        )
+        now = timezone.now()
+        cls.users = {}
+        for name, days, superuser in [
+            ("expired", -1, False),
+            ("current", 1, False),
+            ("admin", -1, True),
+        ]:
+            user = CustomUser.objects.create_user(
+                email=f"{name}@example.com",
+                username=name,
+                password="secret",
+                plan="premium",
+                is_superuser=superuser,
+            )
+            UserSubscription.objects.create(
+                user=user, plan=cls.plan, end_date=now + timezone.timedelta(days=days)
+            )
+            cls.users[name] = user
+
+    def setUp(self):
+        # Первичные ключи повторяются между тестами, а кэш не откатывается.
+        cache.clear()
+
+    def test_downgrades_only_expired_subscriptions(self):
+        expired = self.users["expired"]
+        self.assertTrue(get_entitlement(expired).is_premium)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_subscriptions(batch_size=1), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_subscriptions(batch_size=1), 1)
+        self.assertEqual(expire_subscriptions(), 0)
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.plan, "none")
+        self.assertEqual(expired.subscription.status, "expired")
+        self.assertFalse(get_entitlement(expired).is_premium)
+        self.assertEqual(
+            CustomUser.objects.get(username="current").plan,
+            "premium",
+        )
+        admin = CustomUser.objects.get(username="admin")
+        self.assertEqual(admin.plan, "premium")
+        self.assertFalse(admin.subscription.is_active)
+
+
+class EntitlementInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="plan@example.com", username="plan", password="secret"
+        )
+
+    def test_plan_change_through_save_invalidates_cache(self):
+        self.assertFalse(get_entitlement(self.user).is_premium)
+        self.user.plan = "premium"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertTrue(get_entitlement(self.user).is_premium)
+
+    def test_unrelated_update_keeps_cache(self):
+        get_entitlement(self.user)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.save(update_fields=["last_login"])
+        self.assertEqual(callbacks, [])
+
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_failures_and_recovers_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(PaymentGatewayUnavailable):
+            breaker.before_call()
+        with mock.patch("payment.gateway.time.monotonic", return_value=10**9):
+            breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(PaymentGatewayUnavailable):
+            breaker.before_call()
+
+
+@override_settings(PAYMENT_GATEWAY="payment.gateway.FakeGateway")
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="buyer@example.com", username="buyer", password="secret"
+        )
+        cls.plan = SubscriptionPlan.objects.create(
+            name="Basic", description="", price=5, duration_days=30
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.gateway = get_gateway()
+        self.gateway.calls.clear()
+
+    def test_checkout_goes_through_gateway(self):
+        self.assertIsInstance(self.gateway, FakeGateway)
+        response = self.client.post(
+            reverse("payment:create_checkout_session", args=[self.plan.pk])
+        )
+        self.assertEqual(response.status_code, 302)
+        ((name, params),) = self.gateway.calls
+        self.assertEqual(name, "cs")
+        self.assertEqual(params["metadata"]["plan_id"], self.plan.pk)
+
+    def test_unavailable_gateway_fails_fast(self):
+        with mock.patch.object(
+            self.gateway,
+            "create_checkout_session",
+            side_effect=PaymentGatewayUnavailable("down"),
+        ):
+            response = self.client.post(
+                reverse("payment:create_checkout_session", args=[self.plan.pk])
+            )
+        self.assertRedirects(
+            response,
+            reverse("payment:subscription_plans"),
+            fetch_redirect_response=False,
+        )
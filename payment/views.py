@@ -8,40 +8,20 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
 
-from .models import SubscriptionPlan, UserSubscription
-from accounts.models import CustomUser
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from .events import record_event
+from .gateway import PaymentGatewayUnavailable, get_gateway
+from .models import SubscriptionPlan
 
 
 @login_required
 def subscription_plans(request):
-    try:
-        subscription = UserSubscription.objects.get(
-            user=request.user, is_active=True, end_date__gte=timezone.now()
-        )
-        has_active_subscription = True
-        days_remaining = (subscription.end_date - timezone.now()).days
-    except UserSubscription.DoesNotExist:
-        has_active_subscription = False
-        days_remaining = 0
-        subscription = None
-
-    if not has_active_subscription and request.user.plan == "premium":
-        has_active_subscription = True
-        days_remaining = 30
-
-    is_superuser = request.user.is_superuser
-    if is_superuser:
-        user_plan_display = "Премиум"
-        days_remaining = "∞"
+    entitlement = request.entitlement
+    if entitlement.is_superuser:
         superuser_message = (
             "Вы являетесь суперпользователем. Для вас подписка бесконечна!"
         )
     else:
-        user_plan_display = "Премиум" if has_active_subscription else "Нет подписки"
         superuser_message = ""
 
     plans = SubscriptionPlan.objects.filter(is_active=True)
@@ -50,11 +30,10 @@ def subscription_plans(request):
         request,
         "payment/subscription_plans.html",
         {
-            "has_subscription": has_active_subscription or is_superuser,
-            "user_plan": user_plan_display,
-            "subscription": subscription,
-            "days_remaining": days_remaining,
-            "is_superuser": is_superuser,
+            "has_subscription": entitlement.is_premium,
+            "user_plan": entitlement.plan_display,
+            "days_remaining": entitlement.days_remaining,
+            "is_superuser": entitlement.is_superuser,
             "superuser_message": superuser_message,
             "plans": plans,
         },
@@ -65,14 +44,9 @@ def subscription_plans(request):
 def create_checkout_session(request, plan_id):
     plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
 
-    try:
-        active_subscription = UserSubscription.objects.get(
-            user=request.user, is_active=True, end_date__gte=timezone.now()
-        )
+    if request.entitlement.is_subscribed:
         messages.warning(request, "У вас уже есть активная подписка!")
         return redirect("payment:subscription_plans")
-    except UserSubscription.DoesNotExist:
-        pass
 
     try:
         success_url = (
@@ -81,7 +55,7 @@ def create_checkout_session(request, plan_id):
         )
         cancel_url = request.build_absolute_uri(reverse("payment:cancel"))
 
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = get_gateway().create_checkout_session(
             payment_method_types=["card"],
             line_items=[
                 {
@@ -101,6 +75,11 @@ def create_checkout_session(request, plan_id):
 
         return redirect(checkout_session.url)
 
+    except PaymentGatewayUnavailable:
+        messages.error(
+            request, "Платежный сервис временно недоступен. Попробуйте позже."
+        )
+        return redirect("payment:subscription_plans")
     except Exception as e:
         messages.error(request, f"Ошибка: {str(e)}")
         return redirect("payment:subscription_plans")
@@ -108,37 +87,13 @@ def create_checkout_session(request, plan_id):
 
 @login_required
 def payment_success(request):
-    session_id = request.GET.get("session_id")
-
-    if session_id:
-        try:
-            session = stripe.checkout.Session.retrieve(session_id)
-
-            if session.payment_status == "paid":
-                user_id = session.metadata.get("user_id")
-                plan_id = session.metadata.get("plan_id")
-
-                user = CustomUser.objects.get(id=user_id)
-                plan = SubscriptionPlan.objects.get(id=plan_id)
-
-                subscription = UserSubscription.objects.create(
-                    user=user,
-                    plan=plan,
-                    status="active",
-                    is_active=True,
-                    end_date=timezone.now()
-                    + timezone.timedelta(days=plan.duration_days),
-                )
-
-                user.plan = "premium"
-                user.save()
-
-                messages.success(request, "Подписка успешно активирована!")
-
-        except Exception as e:
-            messages.error(request, f"Ошибка активации подписки: {e}")
-
-    return render(request, "payment/success.html")
+    # Подписку включает вебхук Stripe (payment.events) в фоне, поэтому страница
+    # не обращается к API Stripe и только показывает текущее состояние.
+    return render(
+        request,
+        "payment/success.html",
+        {"activated": request.entitlement.is_subscribed},
+    )
 
 
 @login_required
@@ -148,31 +103,14 @@ def payment_cancel(request):
 
 @login_required
 def subscription_status(request):
-    try:
-        subscription = UserSubscription.objects.get(
-            user=request.user, is_active=True, end_date__gte=timezone.now()
-        )
-        has_active_subscription = True
-    except UserSubscription.DoesNotExist:
-        has_active_subscription = False
-        subscription = None
-
-    if not has_active_subscription and request.user.plan == "premium":
-        has_active_subscription = True
-
-    is_superuser = request.user.is_superuser
-    if is_superuser:
-        user_plan_display = "Премиум"
-    else:
-        user_plan_display = "Премиум" if has_active_subscription else "Нет подписки"
-
+    entitlement = request.entitlement
     return render(
         request,
         "payment/subscription_status.html",
         {
-            "has_subscription": has_active_subscription or is_superuser,
-            "user_plan": user_plan_display,
-            "subscription": subscription,
+            "has_subscription": entitlement.is_premium,
+            "user_plan": entitlement.plan_display,
+            "entitlement": entitlement,
         },
     )
 
@@ -184,7 +122,7 @@ def stripe_webhook(request):
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
     except ValueError as e:
@@ -192,4 +130,7 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return HttpResponse(status=400)
 
+    # Событие сохраняется в журнал и применяется в фоне: Stripe сразу
+    # получает 200, а повторная доставка того же события игнорируется.
+    record_event(payload)
     return HttpResponse(status=200)
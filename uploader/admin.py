@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import UploadFile
+from .models import Blob, FilePreview, FileSearchDocument, UploadFile
 
 
 @admin.register(UploadFile)
@@ -8,12 +8,13 @@ class UploadFileAdmin(admin.ModelAdmin):
     list_display = [
         "original_name",
         "file_category_display",
+        "category",
         "human_size_display",
         "uploaded_at",
         "user_display",
         "download_link",
     ]
-    list_filter = ["content_type", "uploaded_at", "extension", "user__plan"]
+    list_filter = ["category", "content_type", "uploaded_at", "extension", "user__plan"]
     search_fields = [
         "original_name",
         "slug",
@@ -26,9 +27,12 @@ class UploadFileAdmin(admin.ModelAdmin):
         "size",
         "content_type",
         "extension",
+        "sha256",
+        "blob",
         "uploaded_at",
         "human_size_display",
         "file_category_display",
+        "category",
         "preview_link",
         "user_display",
     ]
@@ -43,7 +47,10 @@ class UploadFileAdmin(admin.ModelAdmin):
                     "human_size_display",
                     "content_type",
                     "extension",
+                    "sha256",
+                    "blob",
                     "file_category_display",
+                    "category",
                     "uploaded_at",
                 ),
                 "classes": ("collapse",),
@@ -87,3 +94,26 @@ class UploadFileAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("user")
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ["sha256", "size", "ref_count", "created_at"]
+    search_fields = ["sha256"]
+    readonly_fields = ["sha256", "file", "size", "ref_count", "created_at"]
+
+
+@admin.register(FilePreview)
+class FilePreviewAdmin(admin.ModelAdmin):
+    list_display = ["upload", "status", "updated_at"]
+    list_filter = ["status"]
+    search_fields = ["upload__slug", "upload__original_name"]
+    readonly_fields = ["upload", "image", "text", "error", "updated_at"]
+
+
+@admin.register(FileSearchDocument)
+class FileSearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ["upload", "status", "updated_at"]
+    list_filter = ["status"]
+    search_fields = ["upload__slug"]
+    readonly_fields = ["upload", "user", "status", "content", "error", "updated_at"]
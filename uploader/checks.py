@@ -0,0 +1,16 @@
+from django.core.checks import Error, register
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+
+from .downloads import _check_storage, _configured_backend
+
+
+@register()
+def check_download_backend(app_configs, **kwargs):
+    # Несовместимость DOWNLOAD_BACKEND и FILE_STORAGE видна при запуске,
+    # а не на первом скачивании.
+    try:
+        _check_storage(_configured_backend(), default_storage)
+    except ImproperlyConfigured as exc:
+        return [Error(str(exc), id="uploader.E001")]
+    return []
@@ -0,0 +1,92 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from fileflow.background import BackgroundQueue
+
+from .models import Blob, ChunkedUpload, StorageCleanup
+
+logger = logging.getLogger(__name__)
+
+# Один поток: параллельные сборщики только мешали бы друг другу.
+queue = BackgroundQueue("reaper", "STORAGE_REAPER_WORKERS", max_workers=1)
+
+
+def collect_orphan_blobs(batch_size):
+    """Переносит blob без ссылок в очередь StorageCleanup и удаляет их строки."""
+    with transaction.atomic():
+        # skip_locked: blob, на который acquire() сейчас добавляет ссылку,
+        # пропускаем — после его коммита ref_count уже не будет нулевым.
+        blobs = list(
+            Blob.objects.select_for_update(skip_locked=True)
+            .filter(ref_count=0)
+            .order_by("pk")[:batch_size]
+        )
+        if not blobs:
+            return 0
+        StorageCleanup.objects.bulk_create(
+            [StorageCleanup(path=blob.file.name) for blob in blobs]
+        )
+        Blob.objects.filter(pk__in=[blob.pk for blob in blobs]).delete()
+    return len(blobs)
+
+
+def purge_files(batch_size):
+    """Удаляет из хранилища пачку файлов из очереди StorageCleanup."""
+    with transaction.atomic():
+        entries = list(
+            StorageCleanup.objects.select_for_update(skip_locked=True).order_by("pk")[
+                :batch_size
+            ]
+        )
+        done = []
+        for entry in entries:
+            try:
+                default_storage.delete(entry.path)
+            except Exception:
+                # Запись остается в очереди, следующий проход попробует снова.
+                logger.exception("Не удалось удалить файл %s", entry.path)
+                continue
+            done.append(entry.pk)
+        StorageCleanup.objects.filter(pk__in=done).delete()
+    return len(done)
+
+
+def expire_chunked_uploads(batch_size):
+    """Удаляет брошенные загрузки по частям вместе с их staging-файлами."""
+    with transaction.atomic():
+        # skip_locked: загрузку, в которую сейчас пишется часть, не трогаем.
+        uploads = list(
+            ChunkedUpload.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lt=timezone.now())
+            .order_by("pk")[:batch_size]
+        )
+        ChunkedUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    for upload in uploads:
+        try:
+            os.remove(upload.staging_path)
+        except FileNotFoundError:
+            pass
+    return len(uploads)
+
+
+def reap_storage(batch_size=None):
+    batch_size = batch_size or settings.STORAGE_REAPER_BATCH_SIZE
+    blobs = files = uploads = 0
+    while True:
+        collected = collect_orphan_blobs(batch_size)
+        purged = purge_files(batch_size)
+        expired = expire_chunked_uploads(batch_size)
+        blobs += collected
+        files += purged
+        uploads += expired
+        if not collected and not purged and not expired:
+            return blobs, files, uploads
+
+
+def schedule_reap():
+    queue.submit(reap_storage)
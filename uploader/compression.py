@@ -0,0 +1,102 @@
+import gzip
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Типы, которые хорошо сжимаются (кроме text/*). Уже сжатые форматы —
+# zip, rar, docx/xlsx, jpeg, png, mp4 и т. п. — хранятся как есть.
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def compression_encoding(content_type, size):
+    """Кодировка, в которой хранить новый файл, или "" — хранить как есть."""
+    encoding = settings.UPLOAD_COMPRESSION
+    if not encoding or not size or size < settings.UPLOAD_COMPRESSION_MIN_SIZE:
+        return ""
+    content_type = content_type or ""
+    if not content_type.startswith("text/") and content_type not in COMPRESSIBLE_TYPES:
+        return ""
+    if encoding == "zstd" and zstandard is None:
+        raise ImproperlyConfigured(
+            "Для UPLOAD_COMPRESSION=zstd нужен пакет zstandard (pip install zstandard)"
+        )
+    return encoding
+
+
+def compress(source, encoding):
+    """Сжимает файл во временный файл. Возвращает его и размер сжатых данных."""
+    target = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    source.seek(0)
+    if encoding == "zstd":
+        zstandard.ZstdCompressor().copy_stream(source, target)
+    else:
+        # mtime=0: одинаковое содержимое дает одинаковые байты.
+        with gzip.GzipFile(fileobj=target, mode="wb", mtime=0) as writer:
+            shutil.copyfileobj(source, writer, COPY_CHUNK_SIZE)
+    size = target.tell()
+    target.seek(0)
+    source.seek(0)
+    return target, size
+
+
+class DecodedReader(io.RawIOBase):
+    """Распакованное содержимое сжатого файла; закрывает и исходный файл."""
+
+    def __init__(self, fileobj, encoding):
+        self._source = fileobj
+        if encoding == "zstd":
+            self._reader = zstandard.ZstdDecompressor().stream_reader(fileobj)
+        else:
+            self._reader = gzip.GzipFile(fileobj=fileobj, mode="rb")
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._reader.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._reader.close()
+            self._source.close()
+        super().close()
+
+
+def decompress(fileobj, encoding):
+    return io.BufferedReader(DecodedReader(fileobj, encoding), COPY_CHUNK_SIZE)
+
+
+def accepts_encoding(request, encoding):
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() not in (encoding, "*"):
+            continue
+        params = params.strip().replace(" ", "")
+        if not params.startswith("q="):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
@@ -0,0 +1,428 @@
+import asyncio
+import re
+import secrets
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_http_date_safe,
+)
+
+from .compression import accepts_encoding
+from .storage import S3Storage
+
+RANGE_SPEC_RE = re.compile(r"^(\d*)-(\d*)$")
+
+# Больше диапазонов в одном запросе не обслуживаем: отдаем файл целиком.
+MAX_RANGES = 16
+
+
+def parse_range_header(header, size):
+    """
+    Разбирает заголовок Range. Возвращает None, если его нужно проигнорировать,
+    [] для неудовлетворимого запроса и отсортированный список пар
+    (start, end) включительно без пересечений в остальных случаях.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    ranges = []
+    for spec in header[len("bytes=") :].split(","):
+        match = RANGE_SPEC_RE.match(spec.strip())
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and start > end:
+                return None
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start >= size or start > end:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _stored_etag(upload):
+    # Сжатые байты — отдельное представление файла со своим ETag.
+    if upload.encoding:
+        return f'{upload.etag[:-1]}-{upload.encoding}"'
+    return upload.etag
+
+
+def _requested_ranges(request, upload, size):
+    if request.method not in ("GET", "HEAD"):
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != _stored_etag(upload):
+        if parse_http_date_safe(if_range) != upload.last_modified:
+            return None
+    return parse_range_header(request.headers.get("Range"), size)
+
+
+def _iter_chunks(fileobj, block_size):
+    with fileobj:
+        while data := fileobj.read(block_size):
+            yield data
+
+
+async def _aiter_chunks(fileobj, block_size):
+    with fileobj:
+        while data := await asyncio.to_thread(fileobj.read, block_size):
+            yield data
+
+
+def _iter_range(fileobj, start, end, block_size):
+    with fileobj:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = fileobj.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _iter_multipart(fileobj, parts, closing, block_size):
+    with fileobj:
+        for header, (start, end) in parts:
+            yield header
+            fileobj.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = fileobj.read(min(block_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+            yield b"\r\n"
+        yield closing
+
+
+async def _aiter_range(fileobj, start, end, block_size):
+    # Чтение уходит в поток, поэтому медленный клиент не блокирует цикл
+    # событий: ASGI-воркер держит тысячи таких загрузок без потока на каждую.
+    with fileobj:
+        fileobj.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = await asyncio.to_thread(fileobj.read, min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+async def _aiter_multipart(fileobj, parts, closing, block_size):
+    with fileobj:
+        for header, (start, end) in parts:
+            yield header
+            fileobj.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = await asyncio.to_thread(fileobj.read, min(block_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+            yield b"\r\n"
+        yield closing
+
+
+def _content_type(upload, as_attachment):
+    # Текст показываем как есть: HTML/SVG пользователя не должен исполняться.
+    if not as_attachment and upload.is_text:
+        return "text/plain"
+    return upload.content_type or "application/octet-stream"
+
+
+def _stream_response(
+    request, upload, fileobj, as_attachment, block_size, asynchronous=False
+):
+    size = upload.stored_size
+    content_type = _content_type(upload, as_attachment)
+    ranges = _requested_ranges(request, upload, size)
+    iter_range = _aiter_range if asynchronous else _iter_range
+    iter_multipart = _aiter_multipart if asynchronous else _iter_multipart
+
+    if ranges is None and asynchronous:
+        # FileResponse читает файл синхронно, поэтому весь файл отдаем тем же
+        # асинхронным итератором, что и диапазоны.
+        response = StreamingHttpResponse(
+            iter_range(fileobj, 0, size - 1, block_size), content_type=content_type
+        )
+        response["Content-Length"] = size
+        response["Content-Disposition"] = content_disposition_header(
+            as_attachment, upload.original_name
+        )
+        return response
+
+    if ranges is None:
+        response = FileResponse(
+            fileobj,
+            as_attachment=as_attachment,
+            filename=upload.original_name,
+            content_type=content_type,
+        )
+        response.block_size = block_size
+        return response
+
+    if not ranges:
+        fileobj.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            iter_range(fileobj, start, end, block_size),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    else:
+        boundary = secrets.token_hex(16)
+        parts = [
+            (
+                (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("ascii"),
+                (start, end),
+            )
+            for start, end in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode("ascii")
+        response = StreamingHttpResponse(
+            iter_multipart(fileobj, parts, closing, block_size),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response["Content-Length"] = len(closing) + sum(
+            len(header) + end - start + 1 + 2 for header, (start, end) in parts
+        )
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, upload.original_name
+    )
+    return response
+
+
+def _decoded_response(upload, fileobj, as_attachment, asynchronous=False):
+    # Клиент не принимает кодировку, в которой хранится файл: распаковываем
+    # на лету. Длина известна заранее, а Range для такого ответа не поддерживаем.
+    iter_chunks = _aiter_chunks if asynchronous else _iter_chunks
+    response = StreamingHttpResponse(
+        iter_chunks(fileobj, settings.DOWNLOAD_BLOCK_SIZE),
+        content_type=_content_type(upload, as_attachment),
+    )
+    response["Content-Length"] = upload.size
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, upload.original_name
+    )
+    return response
+
+
+def _offload_response(upload, as_attachment):
+    # Тело (и Range-запросы) обслужит веб-сервер, воркер освобождается сразу
+    # после проверок доступа.
+    response = HttpResponse(content_type=_content_type(upload, as_attachment))
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, upload.original_name
+    )
+    return response
+
+
+def django_backend(request, upload, as_attachment=True):
+    return _stream_response(
+        request, upload, upload.file.open("rb"), as_attachment, FileResponse.block_size
+    )
+
+
+def sendfile_backend(request, upload, as_attachment=True):
+    # Настоящий файловый дескриптор уходит в wsgi.file_wrapper, и gunicorn
+    # отдает файл через os.sendfile, не копируя байты в Python.
+    return _stream_response(
+        request,
+        upload,
+        open(upload.file.path, "rb"),
+        as_attachment,
+        settings.DOWNLOAD_BLOCK_SIZE,
+    )
+
+
+def x_accel_redirect_backend(request, upload, as_attachment=True):
+    response = _offload_response(upload, as_attachment)
+    response["X-Accel-Redirect"] = settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX + quote(
+        upload.file.name
+    )
+    return response
+
+
+def x_sendfile_backend(request, upload, as_attachment=True):
+    response = _offload_response(upload, as_attachment)
+    response["X-Sendfile"] = upload.file.path
+    return response
+
+
+def presigned_redirect_backend(request, upload, as_attachment=True):
+    # Байты (вместе с Range и ETag) отдает само хранилище по подписанной
+    # ссылке, Django только проверяет доступ.
+    url = upload.file.storage.url(
+        upload.file.name,
+        response_headers={
+            "Content-Disposition": content_disposition_header(
+                as_attachment, upload.original_name
+            ),
+            "Content-Type": _content_type(upload, as_attachment),
+            **({"Content-Encoding": upload.encoding} if upload.encoding else {}),
+        },
+    )
+    response = HttpResponseRedirect(url)
+    # Ссылка скоро истечет: перенаправление нельзя кэшировать.
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
+DOWNLOAD_BACKENDS = {
+    "django": django_backend,
+    "sendfile": sendfile_backend,
+    "x-accel-redirect": x_accel_redirect_backend,
+    "x-sendfile": x_sendfile_backend,
+    "presigned-redirect": presigned_redirect_backend,
+}
+
+
+# nginx при X-Accel-Redirect не переносит Content-Encoding из ответа Django, и
+# на X-Sendfile в этом тоже нельзя полагаться: сжатые blob эти бэкенды не отдают.
+OFFLOAD_BACKENDS = {x_accel_redirect_backend, x_sendfile_backend}
+
+# Эти бэкенды передают веб-серверу путь к файлу на локальном диске.
+LOCAL_PATH_BACKENDS = {sendfile_backend, x_sendfile_backend}
+
+
+def _has_local_paths(storage):
+    try:
+        storage.path("")
+    except NotImplementedError:
+        return False
+    return True
+
+
+def _check_storage(backend, storage):
+    if backend is presigned_redirect_backend and not isinstance(storage, S3Storage):
+        raise ImproperlyConfigured(
+            "DOWNLOAD_BACKEND=presigned-redirect работает только с FILE_STORAGE=s3"
+        )
+    if backend in LOCAL_PATH_BACKENDS and not _has_local_paths(storage):
+        raise ImproperlyConfigured(
+            f"DOWNLOAD_BACKEND={settings.DOWNLOAD_BACKEND} работает только "
+            "с FILE_STORAGE=filesystem: хранилищу нужны локальные пути к файлам"
+        )
+
+
+def _configured_backend():
+    try:
+        return DOWNLOAD_BACKENDS[settings.DOWNLOAD_BACKEND]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Неизвестный DOWNLOAD_BACKEND: {settings.DOWNLOAD_BACKEND!r}. "
+            f"Допустимые значения: {', '.join(DOWNLOAD_BACKENDS)}."
+        )
+
+
+def _get_backend(upload):
+    backend = _configured_backend()
+    _check_storage(backend, upload.file.storage)
+    if upload.encoding and backend in OFFLOAD_BACKENDS:
+        return django_backend
+    return backend
+
+
+def _set_validators(response, upload, decoded=False):
+    if upload.encoding:
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if not decoded and response.status_code != 304:
+            response["Content-Encoding"] = upload.encoding
+    response["ETag"] = upload.etag if decoded else _stored_etag(upload)
+    response["Last-Modified"] = http_date(upload.last_modified)
+    response["Accept-Ranges"] = "none" if decoded else "bytes"
+    response["Cache-Control"] = "private"
+    return response
+
+
+def _wants_decoded(request, upload):
+    return bool(upload.encoding) and not accepts_encoding(request, upload.encoding)
+
+
+def serve_file(request, upload, as_attachment=True):
+    backend = _get_backend(upload)
+    decoded = _wants_decoded(request, upload)
+    if backend is presigned_redirect_backend and not decoded:
+        return backend(request, upload, as_attachment=as_attachment)
+    response = get_conditional_response(
+        request,
+        etag=upload.etag if decoded else _stored_etag(upload),
+        last_modified=upload.last_modified,
+    )
+    if response is None and decoded:
+        response = _decoded_response(upload, upload.open_content(), as_attachment)
+    elif response is None:
+        response = backend(request, upload, as_attachment=as_attachment)
+    return _set_validators(response, upload, decoded)
+
+
+async def aserve_file(request, upload, as_attachment=True):
+    """Асинхронный serve_file() для ASGI: файл читается без блокировки цикла."""
+    backend = _get_backend(upload)
+    decoded = _wants_decoded(request, upload)
+    if backend is presigned_redirect_backend and not decoded:
+        # Подпись ссылки считается локально, без обращения к хранилищу.
+        return backend(request, upload, as_attachment=as_attachment)
+    response = get_conditional_response(
+        request,
+        etag=upload.etag if decoded else _stored_etag(upload),
+        last_modified=upload.last_modified,
+    )
+    if response is None and decoded:
+        fileobj = await asyncio.to_thread(upload.open_content)
+        response = _decoded_response(upload, fileobj, as_attachment, asynchronous=True)
+    elif response is None and backend in (django_backend, sendfile_backend):
+        # sendfile под ASGI недоступен — оба варианта отдаем потоком.
+        fileobj = await asyncio.to_thread(
+            upload.file.storage.open, upload.file.name, "rb"
+        )
+        response = _stream_response(
+            request,
+            upload,
+            fileobj,
+            as_attachment,
+            settings.DOWNLOAD_BLOCK_SIZE,
+            asynchronous=True,
+        )
+    elif response is None:
+        response = backend(request, upload, as_attachment=as_attachment)
+    return _set_validators(response, upload, decoded)
@@ -0,0 +1,58 @@
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+
+from .inspection import FileInspector
+
+
+class InspectingUploadHandlerMixin:
+    """
+    Считает SHA-256, размер и тип файла по мере поступления частей, пока
+    обработчик записывает их в память или во временный файл, и отбрасывает
+    файл, как только он превысит лимит тарифа или свободное место пользователя.
+    """
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        self.inspector = FileInspector(file_name)
+        super().new_file(field_name, file_name, *args, **kwargs)
+
+    def size_limit(self):
+        user = getattr(self.request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        entitlement = self.request.entitlement
+        return min(entitlement.max_file_size, entitlement.storage_left(user))
+
+    def receive_data_chunk(self, raw_data, start):
+        limit = self.size_limit()
+        if limit is not None and start + len(raw_data) > limit:
+            if not hasattr(self.request, "rejected_uploads"):
+                self.request.rejected_uploads = []
+            self.request.rejected_uploads.append(self.file_name)
+            raise SkipFile()
+        remaining = super().receive_data_chunk(raw_data, start)
+        # None означает, что часть забрал этот обработчик, а не следующий.
+        if remaining is None:
+            self.inspector.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.inspector.sha256
+            uploaded.content_type = self.inspector.content_type
+        return uploaded
+
+
+class InspectingMemoryFileUploadHandler(
+    InspectingUploadHandlerMixin, MemoryFileUploadHandler
+):
+    pass
+
+
+class InspectingTemporaryFileUploadHandler(
+    InspectingUploadHandlerMixin, TemporaryFileUploadHandler
+):
+    pass
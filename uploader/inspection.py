@@ -0,0 +1,123 @@
+import hashlib
+import mimetypes
+import os
+
+# Сколько первых байт файла сохраняем для определения типа по сигнатуре.
+# Сигнатура ISO 9660 лежит на смещении 32769, поэтому берем с запасом.
+SNIFF_SIZE = 64 * 1024
+
+MAGIC_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"PK\x05\x06", "application/zip"),
+    (0, b"Rar!\x1a\x07", "application/x-rar-compressed"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+    (0, b"MZ", "application/x-msdownload"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (32769, b"CD001", "application/x-iso9660-image"),
+]
+
+RIFF_FORMATS = {
+    b"WAVE": "audio/wav",
+    b"WEBP": "image/webp",
+    b"AVI ": "video/x-msvideo",
+}
+
+# Контейнеры, конкретный тип внутри которых определяем по расширению:
+# docx/xlsx/pptx — это ZIP, а doc/xls/ppt — OLE.
+CONTAINER_EXTENSIONS = {
+    "application/zip": {"docx", "xlsx", "pptx"},
+    "application/x-ole-storage": {"doc", "xls", "ppt", "msi"},
+}
+
+
+def guess_content_type(filename):
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed or "application/octet-stream"
+
+
+def _match_signature(head):
+    if head[:4] == b"RIFF" and head[8:12] in RIFF_FORMATS:
+        return RIFF_FORMATS[head[8:12]]
+    for offset, signature, content_type in MAGIC_SIGNATURES:
+        if head[offset : offset + len(signature)] == signature:
+            return content_type
+    return None
+
+
+def _looks_like_text(head):
+    if not head or b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # Файл мог быть обрезан посреди многобайтового символа.
+        return exc.start >= len(head) - 3
+    return True
+
+
+def sniff_content_type(head, filename=""):
+    head = bytes(head[:SNIFF_SIZE])
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    detected = _match_signature(head)
+    if detected in CONTAINER_EXTENSIONS:
+        if extension in CONTAINER_EXTENSIONS[detected]:
+            return guess_content_type(filename)
+        if detected == "application/x-ole-storage":
+            return "application/octet-stream"
+    if detected:
+        return detected
+    if _looks_like_text(head):
+        guessed = guess_content_type(filename)
+        if guessed.startswith("text/") or guessed in (
+            "application/json",
+            "application/xml",
+        ):
+            return guessed
+        return "text/plain"
+    return guess_content_type(filename)
+
+
+class FileInspector:
+    """Считает размер, SHA-256 и тип файла за один проход по его частям."""
+
+    def __init__(self, file_name=""):
+        self.file_name = file_name
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._head = bytearray()
+
+    def update(self, data):
+        self.size += len(data)
+        self._digest.update(data)
+        if len(self._head) < SNIFF_SIZE:
+            self._head += data[: SNIFF_SIZE - len(self._head)]
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    @property
+    def content_type(self):
+        return sniff_content_type(self._head, self.file_name)
+
+
+def inspect_file(uploaded):
+    inspector = FileInspector(uploaded.name or "")
+    for chunk in uploaded.chunks():
+        inspector.update(chunk)
+    uploaded.seek(0)
+    uploaded.sha256 = inspector.sha256
+    uploaded.content_type = inspector.content_type
+    return uploaded
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+
+from uploader.inspection import SNIFF_SIZE, sniff_content_type
+from uploader.models import UploadFile, classify_file
+
+
+class Command(BaseCommand):
+    help = "Fill in the stored category of uploaded files in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Reclassify every file, not only files without a category",
+        )
+        parser.add_argument(
+            "--sniff",
+            action="store_true",
+            help="Re-detect the content type from the first bytes of each stored file",
+        )
+
+    def handle(self, *args, **options):
+        files = (
+            UploadFile.objects.select_related("blob")
+            .only(
+                "pk",
+                "file",
+                "original_name",
+                "content_type",
+                "extension",
+                "category",
+                "blob__encoding",
+            )
+            .order_by("pk")
+        )
+        if not options["all"]:
+            files = files.filter(category="")
+        last_pk = 0
+        checked = updated = 0
+        while True:
+            batch = list(files.filter(pk__gt=last_pk)[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for upload in batch:
+                content_type = upload.content_type
+                if options["sniff"]:
+                    content_type = self.sniff(upload) or content_type
+                category = classify_file(content_type, upload.extension)
+                if (content_type, category) != (upload.content_type, upload.category):
+                    upload.content_type = content_type
+                    upload.category = category
+                    changed.append(upload)
+            UploadFile.objects.bulk_update(changed, ["content_type", "category"])
+            checked += len(batch)
+            updated += len(changed)
+            self.stdout.write(f"Checked {checked} files, updated {updated}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} files. Updated {updated}.")
+        )
+
+    def sniff(self, upload):
+        try:
+            with upload.open_content() as fileobj:
+                head = fileobj.read(SNIFF_SIZE)
+        except OSError as e:
+            self.stderr.write(f"{upload.pk}: cannot read {upload.file.name}: {e}")
+            return None
+        return sniff_content_type(head, upload.original_name)
@@ -0,0 +1,50 @@
+from django.db.models import Q
+
+from fileflow.background import WorkerCommand
+from uploader.models import FilePreview, UploadFile
+from uploader.previews import process_preview
+
+
+class Command(WorkerCommand):
+    help = "Generate pending file previews (thumbnails, first PDF pages, text snippets)"
+    loop_help = "Keep polling for new pending previews (worker mode)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Queue previews for files uploaded before the preview pipeline",
+        )
+
+    def prepare(self, options):
+        if options["missing"]:
+            self.queue_missing(options["batch_size"])
+
+    def queue_missing(self, batch_size):
+        files = UploadFile.objects.filter(
+            Q(content_type__startswith="image/")
+            | Q(content_type__startswith="text/")
+            | Q(content_type="application/pdf"),
+            preview__isnull=True,
+        )
+        queued = 0
+        while True:
+            batch = list(files.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            FilePreview.objects.bulk_create(
+                [FilePreview(upload_id=pk) for pk in batch], ignore_conflicts=True
+            )
+            queued += len(batch)
+        self.stdout.write(f"Queued {queued} previews")
+
+    def process(self, batch_size):
+        processed = self.process_each(
+            FilePreview.objects.filter(status=FilePreview.STATUS_PENDING),
+            process_preview,
+            batch_size,
+        )
+        if processed:
+            self.stdout.write(f"Processed {processed} previews")
+        return processed
@@ -0,0 +1,59 @@
+from django.db.models import Q
+
+from fileflow.background import WorkerCommand
+from uploader.models import FileSearchDocument, UploadFile
+from uploader.search import process_document
+
+
+class Command(WorkerCommand):
+    help = "Extract and index the text of uploaded files for full-text search"
+    loop_help = "Keep polling for new pending documents (worker mode)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Queue files uploaded before the search index existed",
+        )
+
+    def prepare(self, options):
+        if options["missing"]:
+            self.queue_missing(options["batch_size"])
+
+    def queue_missing(self, batch_size):
+        files = UploadFile.objects.filter(
+            Q(content_type__startswith="text/")
+            | Q(
+                content_type__in=[
+                    "application/pdf",
+                    "application/json",
+                    "application/xml",
+                ]
+            ),
+            search_document__isnull=True,
+        )
+        queued = 0
+        while True:
+            batch = list(files.values_list("pk", "user_id")[:batch_size])
+            if not batch:
+                break
+            FileSearchDocument.objects.bulk_create(
+                [
+                    FileSearchDocument(upload_id=pk, user_id=user_id)
+                    for pk, user_id in batch
+                ],
+                ignore_conflicts=True,
+            )
+            queued += len(batch)
+        self.stdout.write(f"Queued {queued} files")
+
+    def process(self, batch_size):
+        processed = self.process_each(
+            FileSearchDocument.objects.filter(status=FileSearchDocument.STATUS_PENDING),
+            process_document,
+            batch_size,
+        )
+        if processed:
+            self.stdout.write(f"Indexed {processed} files")
+        return processed
@@ -0,0 +1,21 @@
+from fileflow.background import WorkerCommand
+from uploader.cleanup import reap_storage
+
+
+class Command(WorkerCommand):
+    help = (
+        "Delete unreferenced blobs, queued files and abandoned chunked uploads "
+        "in batches"
+    )
+    batch_size = 500
+    interval = 30.0
+    loop_help = "Keep polling for new files to delete (worker mode)"
+
+    def process(self, batch_size):
+        blobs, files, uploads = reap_storage(batch_size)
+        if blobs or files or uploads:
+            self.stdout.write(
+                f"Collected {blobs} blobs, deleted {files} files, "
+                f"expired {uploads} chunked uploads"
+            )
+        return blobs + files + uploads
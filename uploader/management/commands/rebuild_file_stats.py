@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from uploader.models import UserFileStats
+
+STATS_FIELDS = [
+    "file_count",
+    "total_size",
+    "by_category",
+    "by_month",
+    "largest",
+    "updated_at",
+]
+
+
+class Command(BaseCommand):
+    help = "Recalculate the materialised per-user file statistics in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            help="Only rebuild statistics of this user id (may be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(pk__in=options["user"])
+        last_pk = 0
+        rebuilt = 0
+        while True:
+            user_ids = list(
+                users.filter(pk__gt=last_pk).values_list("pk", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            with transaction.atomic():
+                # Блокируем строки пачки: загрузки и удаления этих пользователей
+                # подождут пересчета и не потеряют свои изменения.
+                existing = set(
+                    UserFileStats.objects.select_for_update()
+                    .filter(pk__in=user_ids)
+                    .values_list("pk", flat=True)
+                )
+                stats = UserFileStats.objects.compute(user_ids)
+                now = timezone.now()
+                for pk in existing:
+                    # bulk_update не заполняет auto_now.
+                    stats[pk].updated_at = now
+                UserFileStats.objects.bulk_update(
+                    [stats[pk] for pk in existing], STATS_FIELDS
+                )
+                UserFileStats.objects.bulk_create(
+                    [stats[pk] for pk in user_ids if pk not in existing],
+                    ignore_conflicts=True,
+                )
+            rebuilt += len(user_ids)
+            self.stdout.write(f"Rebuilt statistics of {rebuilt} users")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics of {rebuilt} users."))
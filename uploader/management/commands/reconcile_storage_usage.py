@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from uploader.models import UploadFile
+
+
+class Command(BaseCommand):
+    help = "Recalculate per-user storage usage counters and repair drift in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report users whose counter has drifted",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        last_pk = 0
+        checked = repaired = 0
+        while True:
+            with transaction.atomic():
+                # Блокируем пачку пользователей: параллельные загрузки ждут
+                # пересчета и не теряют свои инкременты.
+                users = list(
+                    User.objects.select_for_update()
+                    .filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "storage_used")[: options["batch_size"]]
+                )
+                if not users:
+                    break
+                last_pk = users[-1].pk
+                totals = dict(
+                    UploadFile.objects.filter(user_id__in=[user.pk for user in users])
+                    .values("user_id")
+                    .annotate(total=Sum("size"))
+                    .values_list("user_id", "total")
+                )
+                drifted = []
+                for user in users:
+                    actual = totals.get(user.pk) or 0
+                    if user.storage_used != actual:
+                        self.stdout.write(
+                            f"{user.pk}: counter {user.storage_used}, actual {actual}"
+                        )
+                        user.storage_used = actual
+                        drifted.append(user)
+                if drifted and not options["dry_run"]:
+                    User.objects.bulk_update(drifted, ["storage_used"])
+            checked += len(users)
+            repaired += len(drifted)
+        verb = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} users. {verb} {repaired} counters.")
+        )
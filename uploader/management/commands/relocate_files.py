@@ -0,0 +1,105 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from uploader.cleanup import schedule_reap
+from uploader.models import (
+    FilePreview,
+    StorageCleanup,
+    UploadFile,
+    preview_upload_to,
+    upload_file_upload_to,
+)
+
+
+class Command(BaseCommand):
+    help = "Move uploads and previews into the sharded directory layout in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--model",
+            choices=["files", "previews"],
+            help="Only relocate uploads or only previews (default: both)",
+        )
+        parser.add_argument(
+            "--after",
+            type=int,
+            default=0,
+            help="Resume the --model pass from rows with a primary key greater "
+            "than this one",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count files that would be moved",
+        )
+
+    def handle(self, *args, **options):
+        if options["after"] and not options["model"]:
+            # У UploadFile и FilePreview свои последовательности pk: общий
+            # --after пропустил бы часть превью.
+            raise CommandError("--after requires --model")
+        # Файлы с blob уже лежат в blobs/<hex>/<hex>/ и не переносятся.
+        uploads = UploadFile.objects.filter(blob__isnull=True).exclude(file="")
+        previews = FilePreview.objects.exclude(image="").select_related("upload")
+        for label, queryset, field, upload_to in [
+            ("files", uploads, "file", upload_file_upload_to),
+            ("previews", previews, "image", preview_upload_to),
+        ]:
+            if options["model"] not in (None, label):
+                continue
+            moved = self.relocate(queryset, field, upload_to, options)
+            verb = "Would move" if options["dry_run"] else "Moved"
+            self.stdout.write(self.style.SUCCESS(f"{verb} {moved} {label}"))
+
+    def relocate(self, queryset, field, upload_to, options):
+        model = queryset.model
+        last_pk = options["after"]
+        moved = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).order_by("pk")[: options["batch_size"]]
+            )
+            if not batch:
+                return moved
+            last_pk = batch[-1].pk
+            moves = []
+            for obj in batch:
+                fieldfile = getattr(obj, field)
+                old = fieldfile.name
+                new = upload_to(obj, os.path.basename(old))
+                if old == new:
+                    continue
+                if options["dry_run"]:
+                    moves.append((obj.pk, old, new))
+                    continue
+                # Копия по готовому пути: повторный запуск после сбоя просто
+                # перезапишет ее, поэтому команду можно прерывать.
+                try:
+                    with fieldfile.storage.open(old, "rb") as source:
+                        new = fieldfile.storage.save(new, source)
+                except Exception as e:
+                    self.stderr.write(f"{model.__name__} {obj.pk}: {old}: {e}")
+                    continue
+                moves.append((obj.pk, old, new))
+            if not options["dry_run"]:
+                self.commit_moves(model, field, moves)
+            moved += len(moves)
+            self.stdout.write(f"{model.__name__}: {moved} moved, last id {last_pk}")
+
+    def commit_moves(self, model, field, moves):
+        stale = []
+        with transaction.atomic():
+            for pk, old, new in moves:
+                # Строку могли удалить или заменить файл, пока шло копирование:
+                # тогда лишней становится копия, а не исходный файл.
+                updated = model.objects.filter(pk=pk, **{field: old}).update(
+                    **{field: new}
+                )
+                stale.append(old if updated else new)
+            StorageCleanup.objects.bulk_create(
+                StorageCleanup(path=path) for path in stale
+            )
+            schedule_reap()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0002_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadfile",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64, verbose_name="SHA-256"),
+        ),
+    ]
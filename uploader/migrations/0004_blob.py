@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:14
+
+import django.db.models.deletion
+import uploader.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0003_uploadfile_sha256"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "sha256",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="SHA-256"
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to=uploader.models.blob_upload_to, verbose_name="Файл"
+                    ),
+                ),
+                ("size", models.BigIntegerField(verbose_name="Размер (байт)")),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Число ссылок"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Содержимое файла",
+                "verbose_name_plural": "Содержимое файлов",
+            },
+        ),
+        migrations.AddField(
+            model_name="uploadfile",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="uploads",
+                to="uploader.blob",
+                verbose_name="Содержимое",
+            ),
+        ),
+    ]
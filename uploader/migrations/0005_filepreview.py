@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0004_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FilePreview",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Готовится"),
+                            ("ready", "Готово"),
+                            ("failed", "Ошибка"),
+                            ("unsupported", "Недоступно"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "image",
+                    models.FileField(
+                        blank=True, upload_to="previews/", verbose_name="Миниатюра"
+                    ),
+                ),
+                ("text", models.TextField(blank=True, verbose_name="Фрагмент текста")),
+                (
+                    "error",
+                    models.CharField(blank=True, max_length=255, verbose_name="Ошибка"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+                (
+                    "upload",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preview",
+                        to="uploader.uploadfile",
+                        verbose_name="Файл",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Превью",
+                "verbose_name_plural": "Превью",
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0005_filepreview"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="filepreview",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["id"],
+                name="filepreview_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["user", "-uploaded_at", "-id"],
+                name="uploadfile_user_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["-uploaded_at", "-id"], name="uploadfile_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["content_type", "-uploaded_at", "-id"],
+                name="uploadfile_ctype_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["extension", "-uploaded_at", "-id"],
+                name="uploadfile_ext_recent_idx",
+            ),
+        ),
+        # Индекс по user_id удаляем только после создания составного индекса,
+        # чтобы выборки по пользователю ни на момент не остались без индекса.
+        migrations.AlterField(
+            model_name="uploadfile",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="files",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0006_uploadfile_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StorageCleanup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=500, verbose_name="Путь")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Добавлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Файл на удаление",
+                "verbose_name_plural": "Файлы на удаление",
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0007_storagecleanup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadfile",
+            name="category",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("image", "Изображение"),
+                    ("video", "Видео"),
+                    ("audio", "Аудио"),
+                    ("pdf", "PDF-документ"),
+                    ("document", "Документ"),
+                    ("spreadsheet", "Таблица"),
+                    ("presentation", "Презентация"),
+                    ("archive", "Архив"),
+                    ("executable", "Исполняемый файл"),
+                    ("disk_image", "Образ диска"),
+                    ("other", "Файл"),
+                ],
+                max_length=20,
+                verbose_name="Категория",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["user", "category", "-uploaded_at", "-id"],
+                name="uploadfile_user_cat_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="uploadfile",
+            index=models.Index(
+                fields=["category", "-uploaded_at", "-id"],
+                name="uploadfile_cat_recent_idx",
+            ),
+        ),
+    ]
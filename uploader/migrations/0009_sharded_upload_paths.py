@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:43
+
+import uploader.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0008_uploadfile_category"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="filepreview",
+            name="image",
+            field=models.FileField(
+                blank=True,
+                upload_to=uploader.models.preview_upload_to,
+                verbose_name="Миниатюра",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uploadfile",
+            name="file",
+            field=models.FileField(
+                upload_to=uploader.models.upload_file_upload_to,
+                validators=[uploader.models.validate_file_size_512mb],
+                verbose_name="Файл",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0009_sharded_upload_paths"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blob",
+            name="encoding",
+            field=models.CharField(
+                blank=True,
+                choices=[("gzip", "gzip"), ("zstd", "zstd")],
+                max_length=10,
+                verbose_name="Сжатие",
+            ),
+        ),
+        migrations.AddField(
+            model_name="blob",
+            name="stored_size",
+            field=models.BigIntegerField(
+                blank=True, null=True, verbose_name="Размер в хранилище (байт)"
+            ),
+        ),
+    ]
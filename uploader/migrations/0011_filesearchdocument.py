@@ -0,0 +1,117 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:48
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# pg_trgm нужен для триграммного индекса по имени, btree_gin — чтобы
+# положить user_id в один GIN-индекс с текстом. Индексы строятся
+# CONCURRENTLY, чтобы не блокировать запись в таблицу файлов. На других СУБД
+# поиск работает без них (см. uploader.search).
+SEARCH_EXTENSIONS = ["pg_trgm", "btree_gin"]
+SEARCH_INDEXES = [
+    (
+        "uploadfile_name_trgm_idx",
+        "uploader_uploadfile USING gin (user_id, UPPER(original_name::text) gin_trgm_ops)",
+    ),
+    (
+        "filesearch_vector_idx",
+        "uploader_filesearchdocument USING gin (user_id, vector)",
+    ),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for extension in SEARCH_EXTENSIONS:
+        schema_editor.execute(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+    for name, definition in SEARCH_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("uploader", "0010_blob_compression"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileSearchDocument",
+            fields=[
+                (
+                    "upload",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="uploader.uploadfile",
+                        verbose_name="Файл",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает индексации"),
+                            ("ready", "Проиндексирован"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                ("content", models.TextField(blank=True, verbose_name="Текст")),
+                (
+                    "vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                (
+                    "error",
+                    models.CharField(blank=True, max_length=255, verbose_name="Ошибка"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Поисковый индекс файла",
+                "verbose_name_plural": "Поисковый индекс файлов",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["upload"],
+                        name="filesearch_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
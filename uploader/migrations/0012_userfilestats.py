@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_customuser_email_upper_idx"),
+        ("uploader", "0011_filesearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserFileStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="file_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "file_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Файлов"),
+                ),
+                (
+                    "total_size",
+                    models.BigIntegerField(default=0, verbose_name="Объем (байт)"),
+                ),
+                (
+                    "by_category",
+                    models.JSONField(default=dict, verbose_name="По категориям"),
+                ),
+                ("by_month", models.JSONField(default=dict, verbose_name="По месяцам")),
+                (
+                    "largest",
+                    models.JSONField(default=list, verbose_name="Самые большие файлы"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика файлов",
+                "verbose_name_plural": "Статистика файлов",
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:06
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_expires_at(apps, schema_editor):
+    # Незавершенные загрузки получают полный срок от последней части.
+    ChunkedUpload = apps.get_model("uploader", "ChunkedUpload")
+    ChunkedUpload.objects.update(
+        expires_at=F("updated_at")
+        + timedelta(seconds=settings.FILE_UPLOAD_CHUNKED_EXPIRY)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploader", "0012_userfilestats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chunkedupload",
+            name="expires_at",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Истекает",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_expires_at, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,104 @@
+import hashlib
 import os
+import secrets
+import threading
+from datetime import timedelta
+from collections import Counter, defaultdict
+
 import shortuuid
-import mimetypes
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber, TruncMonth
 from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.core.files.uploadedfile import UploadedFile
 from django.urls import reverse
+from django.utils import timezone
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.contrib.auth import get_user_model
+
+from .compression import compress, compression_encoding, decompress
+from .inspection import guess_content_type, inspect_file
 
+CATEGORY_CHOICES = (
+    ("image", "Изображение"),
+    ("video", "Видео"),
+    ("audio", "Аудио"),
+    ("pdf", "PDF-документ"),
+    ("document", "Документ"),
+    ("spreadsheet", "Таблица"),
+    ("presentation", "Презентация"),
+    ("archive", "Архив"),
+    ("executable", "Исполняемый файл"),
+    ("disk_image", "Образ диска"),
+    ("other", "Файл"),
+)
+CATEGORY_LABELS = dict(CATEGORY_CHOICES)
 
 MIME_CATEGORIES = {
+    "application/pdf": "pdf",
+    "application/msword": "document",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "document",
+    "application/json": "document",
+    "application/xml": "document",
+    "text/csv": "spreadsheet",
+    "application/vnd.ms-excel": "spreadsheet",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "spreadsheet",
+    "application/vnd.ms-powerpoint": "presentation",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "presentation",
+    "application/zip": "archive",
+    "application/x-rar-compressed": "archive",
+    "application/x-7z-compressed": "archive",
+    "application/gzip": "archive",
+    "application/x-tar": "archive",
+    "application/x-msdownload": "executable",
+    "application/x-iso9660-image": "disk_image",
+}
+
+MIME_GROUPS = {
+    "image": "image",
+    "video": "video",
+    "audio": "audio",
+    "text": "document",
+}
+
+# Запасной вариант, когда тип не определился (application/octet-stream).
+EXTENSION_CATEGORIES = {
+    "exe": "executable",
+    "msi": "executable",
+    "iso": "disk_image",
+    "txt": "document",
+    "md": "document",
+    "json": "document",
+    "xml": "document",
+    "doc": "document",
+    "docx": "document",
+    "csv": "spreadsheet",
+    "xls": "spreadsheet",
+    "xlsx": "spreadsheet",
+    "ppt": "presentation",
+    "pptx": "presentation",
+    "jpg": "image",
+    "jpeg": "image",
+    "png": "image",
+    "gif": "image",
+    "pdf": "pdf",
+    "zip": "archive",
+    "rar": "archive",
+    "7z": "archive",
+    "gz": "archive",
+    "tar": "archive",
+    "mp3": "audio",
+    "wav": "audio",
+    "mp4": "video",
+    "mov": "video",
+}
+
+
+# Подписи типа файла для пользователя: точнее категории (Word, Excel, ZIP...).
+MIME_LABELS = {
     "image": "Изображение",
     "text": "Документ",
     "application/pdf": "PDF-документ",
@@ -26,7 +116,7 @@ MIME_CATEGORIES = {
     "video": "Видео",
 }
 
-EXTENSION_CATEGORIES = {
+EXTENSION_LABELS = {
     "exe": "Исполняемый файл",
     "msi": "Инсталлятор",
     "iso": "ISO-образ",
@@ -55,6 +145,16 @@ EXTENSION_CATEGORIES = {
 }
 
 
+def classify_file(content_type, extension):
+    content_type = content_type or ""
+    if content_type in MIME_CATEGORIES:
+        return MIME_CATEGORIES[content_type]
+    group = MIME_GROUPS.get(content_type.split("/")[0])
+    if group:
+        return group
+    return EXTENSION_CATEGORIES.get((extension or "").lower(), "other")
+
+
 def validate_file_size_512mb(file):
     if not file:
         return
@@ -63,12 +163,274 @@ def validate_file_size_512mb(file):
         raise ValidationError("Максимальный размер файла — 512 МБ")
 
 
+# Пути файлов раскладываются по двум уровням из 256 каталогов и уникальны по
+# построению, поэтому хранилище не проверяет exists() перед записью
+# (allow_overwrite в STORAGES).
+
+
+def _shard(key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def blob_upload_to(instance, filename):
+    # Случайный суффикс: путь удаленного blob с тем же содержимым может еще
+    # ждать удаления в StorageCleanup.
+    sha256 = instance.sha256
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}-{secrets.token_hex(4)}"
+
+
+def upload_file_upload_to(instance, filename):
+    extension = os.path.splitext(filename)[1].lower()[:21]
+    return f"uploads/{_shard(instance.slug)}/{instance.slug}{extension}"
+
+
+def preview_upload_to(instance, filename):
+    # Имя миниатюры — slug файла, он уникален.
+    return f"previews/{_shard(filename)}/{filename}"
+
+
+# Файлы blob, записанные в хранилище транзакцией, которая еще не закоммичена.
+# Если она откатится, строки Blob не будет, и файл заберет очистка.
+_pending_blob_files = threading.local()
+
+
+def _track_blob_file(path):
+    if not hasattr(_pending_blob_files, "paths"):
+        _pending_blob_files.paths = set()
+    paths = _pending_blob_files.paths
+    paths.add(path)
+    transaction.on_commit(lambda: paths.discard(path))
+
+
+def queue_rolled_back_blob_files(**kwargs):
+    """
+    Ставит в очередь StorageCleanup файлы, записанные откатившимися
+    транзакциями. Вызывается по request_finished, когда транзакция запроса
+    уже завершена.
+    """
+    from .cleanup import schedule_reap
+
+    paths = getattr(_pending_blob_files, "paths", None)
+    # Внутри atomic (например, в тестах) исход транзакции еще неизвестен.
+    if not paths or transaction.get_connection().in_atomic_block:
+        return
+    _pending_blob_files.paths = set()
+    with transaction.atomic():
+        StorageCleanup.objects.bulk_create(StorageCleanup(path=path) for path in paths)
+        schedule_reap()
+
+
+class BlobManager(models.Manager):
+    def acquire(self, uploaded, sha256):
+        # Блокируем строку, чтобы сборщик (uploader.cleanup) не удалил blob
+        # с нулем ссылок, на который мы сейчас добавляем ссылку.
+        blob = self.select_for_update().filter(sha256=sha256).first()
+        if blob is not None:
+            self.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+            blob.ref_count += 1
+            return blob
+        blob = self._store(uploaded, sha256, ref_count=1)
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # Такой же файл параллельно загрузил кто-то еще — ссылаемся на него.
+            blob.file.delete(save=False)
+            return self.acquire(uploaded, sha256)
+        return blob
+
+    def acquire_many(self, items):
+        """
+        acquire() для пачки пар (uploaded, sha256): один SELECT на все
+        содержимое, один UPDATE на группу с одинаковым числом новых ссылок и
+        один bulk_create() для нового содержимого. Возвращает blob в порядке
+        items; одинаковые файлы пачки ссылаются на один blob.
+        """
+        refs = Counter(sha256 for _, sha256 in items)
+        contents = {sha256: uploaded for uploaded, sha256 in items}
+        blobs = {}
+        with transaction.atomic():
+            pending = dict(refs)
+            while pending:
+                blobs.update(self._add_refs(pending))
+                new = [
+                    self._store(contents[sha256], sha256, ref_count=count)
+                    for sha256, count in pending.items()
+                    if sha256 not in blobs
+                ]
+                self.bulk_create(new, ignore_conflicts=True)
+                inserted = self.in_bulk(
+                    [blob.sha256 for blob in new], field_name="sha256"
+                )
+                pending = {}
+                for blob in new:
+                    row = inserted.get(blob.sha256)
+                    if row is not None and row.file.name == blob.file.name:
+                        blobs[blob.sha256] = row
+                        continue
+                    # Такой же файл параллельно загрузил кто-то еще: ссылку на
+                    # его blob добавит следующий круг.
+                    blob.file.delete(save=False)
+                    pending[blob.sha256] = refs[blob.sha256]
+        return [blobs[sha256] for _, sha256 in items]
+
+    def _add_refs(self, refs):
+        # Блокируем строки, чтобы сборщик (uploader.cleanup) не удалил blob
+        # с нулем ссылок, на который мы сейчас добавляем ссылки.
+        blobs = {
+            blob.sha256: blob
+            for blob in self.select_for_update()
+            .filter(sha256__in=list(refs))
+            .order_by("pk")
+        }
+        blobs_by_refs = defaultdict(list)
+        for sha256, blob in blobs.items():
+            blobs_by_refs[refs[sha256]].append(blob.pk)
+            blob.ref_count += refs[sha256]
+        for count, blob_ids in blobs_by_refs.items():
+            self.filter(pk__in=blob_ids).update(ref_count=F("ref_count") + count)
+        return blobs
+
+    def _store(self, uploaded, sha256, ref_count):
+        """Записывает содержимое в хранилище; строка blob еще не сохранена."""
+        blob = self.model(sha256=sha256, size=uploaded.size, ref_count=ref_count)
+        content = uploaded
+        encoding = compression_encoding(
+            getattr(uploaded, "content_type", ""), uploaded.size
+        )
+        if encoding:
+            compressed, stored_size = compress(uploaded, encoding)
+            # Если сжатие почти ничего не дает, не стоит распаковывать файл
+            # для каждого клиента без поддержки Content-Encoding.
+            if stored_size <= uploaded.size * settings.UPLOAD_COMPRESSION_MAX_RATIO:
+                blob.encoding = encoding
+                blob.stored_size = stored_size
+                content = File(compressed)
+            else:
+                compressed.close()
+        blob.file.save(sha256, content, save=False)
+        _track_blob_file(blob.file.name)
+        if content is not uploaded:
+            content.close()
+        return blob
+
+
+class Blob(models.Model):
+    sha256 = models.CharField("SHA-256", max_length=64, unique=True)
+    file = models.FileField("Файл", upload_to=blob_upload_to)
+    size = models.BigIntegerField("Размер (байт)")
+    # Сжатое содержимое (uploader.compression): кодировка и размер в хранилище.
+    encoding = models.CharField(
+        "Сжатие",
+        max_length=10,
+        choices=(("gzip", "gzip"), ("zstd", "zstd")),
+        blank=True,
+    )
+    stored_size = models.BigIntegerField(
+        "Размер в хранилище (байт)", null=True, blank=True
+    )
+    ref_count = models.PositiveIntegerField("Число ссылок", default=0)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+
+    objects = BlobManager()
+
+    class Meta:
+        verbose_name = "Содержимое файла"
+        verbose_name_plural = "Содержимое файлов"
+
+    def __str__(self):
+        return self.sha256
+
+
+class StorageCleanup(models.Model):
+    # Очередь файлов на удаление из хранилища (transactional outbox): строки
+    # пишутся в той же транзакции, что и удаление записей, а сами файлы
+    # удаляет uploader.cleanup уже после коммита.
+    path = models.CharField("Путь", max_length=500)
+    created_at = models.DateTimeField("Добавлено", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Файл на удаление"
+        verbose_name_plural = "Файлы на удаление"
+
+    def __str__(self):
+        return self.path
+
+
+class UploadFileQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Удаляет записи набором запросов, без поштучной обработки: ссылки на
+        blob уменьшаются одним UPDATE на группу, счетчики места — одним на
+        пользователя, а файлы ставятся в очередь StorageCleanup.
+        """
+        from .cleanup import schedule_reap
+
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        with transaction.atomic(using=self.db):
+            rows = list(
+                self.select_for_update(of=("self",))
+                .order_by()
+                .values_list(
+                    "pk",
+                    "user_id",
+                    "size",
+                    "blob_id",
+                    "file",
+                    "preview__image",
+                    "category",
+                    "uploaded_at",
+                )
+            )
+            if not rows:
+                return 0, {}
+            result = (
+                models.QuerySet(self.model, using=self.db)
+                .filter(pk__in=[row[0] for row in rows])
+                .delete()
+            )
+
+            blob_refs = Counter(row[3] for row in rows if row[3])
+            blobs_by_refs = defaultdict(list)
+            for blob_id, refs in blob_refs.items():
+                blobs_by_refs[refs].append(blob_id)
+            for refs, blob_ids in blobs_by_refs.items():
+                # blob с нулем ссылок удалит сборщик, а не этот запрос.
+                Blob.objects.filter(pk__in=blob_ids).update(
+                    ref_count=F("ref_count") - refs
+                )
+
+            usage = Counter()
+            for _, user_id, size, *_ in rows:
+                usage[user_id] += size or 0
+            for user_id, size in usage.items():
+                if size:
+                    get_user_model().objects.add_storage_usage(user_id, -size)
+            UserFileStats.objects.record_deletes(
+                [(row[1], row[0], row[6], row[2], row[7]) for row in rows]
+            )
+
+            paths = [row[4] for row in rows if row[4] and not row[3]]
+            paths += [row[5] for row in rows if row[5]]
+            StorageCleanup.objects.bulk_create(
+                [StorageCleanup(path=path) for path in paths]
+            )
+            schedule_reap()
+        return result
+
+
 class UploadFile(models.Model):
+    # Отдельный индекс по user не нужен: его покрывает uploadfile_user_recent_idx.
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="files"
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="files",
+        db_index=False,
     )
     file = models.FileField(
-        upload_to="uploads/%Y/%m/%d/",
+        upload_to=upload_file_upload_to,
         verbose_name="Файл",
         validators=[validate_file_size_512mb],
     )
@@ -78,31 +440,116 @@ class UploadFile(models.Model):
     size = models.BigIntegerField("Размер (байт)", null=True, blank=True)
     content_type = models.CharField("Тип содержимого", max_length=100, blank=True)
     extension = models.CharField("Расширение", max_length=20, blank=True)
+    sha256 = models.CharField("SHA-256", max_length=64, blank=True)
+    # Определяется один раз при загрузке; пустая у строк, которые еще не
+    # обработала команда classify_files.
+    category = models.CharField(
+        "Категория", max_length=20, choices=CATEGORY_CHOICES, blank=True
+    )
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        related_name="uploads",
+        null=True,
+        blank=True,
+        verbose_name="Содержимое",
+    )
+
+    objects = UploadFileQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Файл"
         verbose_name_plural = "Файлы"
         ordering = ["-uploaded_at"]
+        indexes = [
+            # Списки файлов пользователя (keyset-пагинация по uploaded_at, id).
+            models.Index(
+                fields=["user", "-uploaded_at", "-id"],
+                name="uploadfile_user_recent_idx",
+            ),
+            # Админка: общий список и фильтры по типу и расширению.
+            models.Index(fields=["-uploaded_at", "-id"], name="uploadfile_recent_idx"),
+            models.Index(
+                fields=["content_type", "-uploaded_at", "-id"],
+                name="uploadfile_ctype_recent_idx",
+            ),
+            models.Index(
+                fields=["extension", "-uploaded_at", "-id"],
+                name="uploadfile_ext_recent_idx",
+            ),
+            # Фильтр по категории в списке файлов пользователя и в админке.
+            models.Index(
+                fields=["user", "category", "-uploaded_at", "-id"],
+                name="uploadfile_user_cat_idx",
+            ),
+            models.Index(
+                fields=["category", "-uploaded_at", "-id"],
+                name="uploadfile_cat_recent_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.original_name or "Без имени"
 
-    def save(self, *args, **kwargs):
+    def prepare_file(self, acquire_blob=True):
+        # Вызывается из save() и через prepare_files() перед bulk_create(),
+        # который save() не вызывает.
         if not self.slug:
             self.slug = shortuuid.uuid()
         if self.file and not self.original_name:
             self.original_name = os.path.basename(self.file.name)
-        if self.file:
-            self.size = getattr(self.file, "size", None)
-            filename = getattr(self.file, "name", "") or ""
+        if self.file and not self.file._committed:
+            # Новый файл: метаданные, посчитанные обработчиком загрузки
+            # (uploader.handlers) за один проход, берем с самого объекта.
+            uploaded = self.file.file
+            self.size = getattr(uploaded, "size", None)
+            filename = getattr(uploaded, "name", "") or ""
             self.extension = os.path.splitext(filename)[1].lower().lstrip(".")
-            content_type_from_file = getattr(self.file, "content_type", None)
+            self.sha256 = getattr(uploaded, "sha256", "") or ""
+            content_type_from_file = getattr(uploaded, "content_type", None)
             if content_type_from_file:
                 self.content_type = content_type_from_file
             else:
-                guessed, _ = mimetypes.guess_type(filename)
-                self.content_type = guessed or "application/octet-stream"
+                self.content_type = guess_content_type(filename)
+            if self.sha256 and acquire_blob:
+                # Одинаковое содержимое хранится один раз: вместо записи
+                # нового файла ссылаемся на уже существующий blob.
+                self.blob = Blob.objects.acquire(uploaded, self.sha256)
+                self.file = self.blob.file.name
+        if not self.category:
+            self.category = classify_file(self.content_type, self.extension)
+
+    @classmethod
+    def prepare_files(cls, objs):
+        """
+        prepare_file() для пачки перед bulk_create(): blob всех файлов берутся
+        одним Blob.objects.acquire_many(), а не запросами на каждый файл.
+        """
+        for obj in objs:
+            obj.prepare_file(acquire_blob=False)
+        new = [obj for obj in objs if obj.sha256 and not obj.file._committed]
+        blobs = Blob.objects.acquire_many([(obj.file.file, obj.sha256) for obj in new])
+        for obj, blob in zip(new, blobs):
+            obj.blob = blob
+            obj.file = blob.file.name
+
+    def save(self, *args, **kwargs):
+        self.prepare_file()
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if adding:
+            if self.size:
+                self.user.add_storage_usage(self.size)
+            UserFileStats.objects.record_uploads([self])
+
+    def delete(self, using=None, keep_parents=False):
+        # Тот же путь, что и при массовом удалении: файлы удаляются после коммита.
+        return (
+            type(self)
+            .objects.using(using or self._state.db)
+            .filter(pk=self.pk)
+            .delete()
+        )
 
     def get_download_url(self):
         return reverse("uploader:file_download", args=[self.slug])
@@ -110,6 +557,38 @@ class UploadFile(models.Model):
     def get_view_url(self):
         return reverse("uploader:file_detail", args=[self.slug])
 
+    def get_inline_url(self):
+        return reverse("uploader:file_inline", args=[self.slug])
+
+    @property
+    def encoding(self):
+        # Сжатым бывает только содержимое blob.
+        return self.blob.encoding if self.blob_id else ""
+
+    @property
+    def stored_size(self):
+        if self.encoding:
+            return self.blob.stored_size
+        return self.size if self.size is not None else self.file.size
+
+    def open_content(self):
+        """Открывает файл на чтение уже распакованного содержимого."""
+        fileobj = self.file.storage.open(self.file.name, "rb")
+        if self.encoding:
+            return decompress(fileobj, self.encoding)
+        return fileobj
+
+    @property
+    def etag(self):
+        # Содержимое под одним slug не меняется, поэтому ETag сильный.
+        if self.sha256:
+            return f'"{self.sha256}"'
+        return f'"{self.slug}-{self.size or 0}"'
+
+    @property
+    def last_modified(self):
+        return int(self.uploaded_at.timestamp())
+
     @property
     def human_size(self):
         if not self.size:
@@ -123,21 +602,16 @@ class UploadFile(models.Model):
 
     @property
     def file_category(self):
-        if not self.content_type:
-            ext = (self.extension or "").lower()
-            return EXTENSION_CATEGORIES.get(ext, "Файл")
-        if self.content_type in MIME_CATEGORIES:
-            return MIME_CATEGORIES[self.content_type]
-        if self.content_type.startswith("image/"):
-            return "Изображение"
-        if self.content_type.startswith("text/"):
-            return "Документ"
-        if self.content_type.startswith("audio/"):
-            return "Аудио"
-        if self.content_type.startswith("video/"):
-            return "Видео"
+        # Подпись по типу содержимого; для фильтров и индексов — category.
         ext = (self.extension or "").lower()
-        return EXTENSION_CATEGORIES.get(ext, "Файл")
+        if not self.content_type:
+            return EXTENSION_LABELS.get(ext, "Файл")
+        if self.content_type in MIME_LABELS:
+            return MIME_LABELS[self.content_type]
+        group = self.content_type.split("/")[0]
+        if group in ("image", "text", "audio", "video"):
+            return MIME_LABELS[group]
+        return EXTENSION_LABELS.get(ext, "Файл")
 
     @property
     def is_image(self):
@@ -152,5 +626,393 @@ class UploadFile(models.Model):
         return bool(self.content_type and self.content_type.startswith("text/"))
 
     @property
-    def is_previewable(self):
+    def is_audio(self):
+        return bool(self.content_type and self.content_type.startswith("audio/"))
+
+    @property
+    def is_video(self):
+        return bool(self.content_type and self.content_type.startswith("video/"))
+
+    @property
+    def needs_preview(self):
+        # Для этих типов превью строится в фоне (uploader.previews),
+        # аудио и видео проигрываются напрямую.
         return self.is_image or self.is_pdf or self.is_text
+
+    @property
+    def is_searchable(self):
+        # Текст этих файлов индексируется для поиска (uploader.search).
+        return (
+            self.is_text
+            or self.is_pdf
+            or self.content_type in ("application/json", "application/xml")
+        )
+
+    @property
+    def is_previewable(self):
+        return (
+            self.is_image
+            or self.is_pdf
+            or self.is_text
+            or self.is_audio
+            or self.is_video
+        )
+
+
+class FilePreview(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_UNSUPPORTED = "unsupported"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Готовится"),
+        (STATUS_READY, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+        (STATUS_UNSUPPORTED, "Недоступно"),
+    )
+
+    upload = models.OneToOneField(
+        UploadFile,
+        on_delete=models.CASCADE,
+        related_name="preview",
+        verbose_name="Файл",
+    )
+    status = models.CharField(
+        "Статус", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    image = models.FileField("Миниатюра", upload_to=preview_upload_to, blank=True)
+    text = models.TextField("Фрагмент текста", blank=True)
+    error = models.CharField("Ошибка", max_length=255, blank=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Превью"
+        verbose_name_plural = "Превью"
+        indexes = [
+            # Очередь generate_previews: в индексе только ожидающие превью.
+            models.Index(
+                fields=["id"],
+                name="filepreview_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.upload} ({self.get_status_display()})"
+
+    @property
+    def is_pending(self):
+        return self.status == self.STATUS_PENDING
+
+    @property
+    def is_ready(self):
+        return self.status == self.STATUS_READY
+
+    def get_image_url(self):
+        return reverse("uploader:file_preview", args=[self.upload.slug])
+
+
+class StagedUploadedFile(UploadedFile):
+    # FileSystemStorage перемещает файлы с temporary_file_path() через rename,
+    # поэтому собранный из частей файл не копируется второй раз.
+    def __init__(self, path, name, size):
+        super().__init__(open(path, "rb"), name=name, size=size)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+class FileSearchDocument(models.Model):
+    """
+    Текст, извлеченный из файла для полнотекстового поиска (uploader.search).
+    GIN-индексы по vector и по имени файла создает миграция 0011 (только PostgreSQL).
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Ожидает индексации"),
+        (STATUS_READY, "Проиндексирован"),
+        (STATUS_FAILED, "Ошибка"),
+    )
+
+    upload = models.OneToOneField(
+        UploadFile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+        verbose_name="Файл",
+    )
+    # Копия upload.user: поиск фильтрует по пользователю без соединения таблиц.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    status = models.CharField(
+        "Статус", max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    content = models.TextField("Текст", blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+    error = models.CharField("Ошибка", max_length=255, blank=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Поисковый индекс файла"
+        verbose_name_plural = "Поисковый индекс файлов"
+        indexes = [
+            # Очередь index_files: в индексе только ожидающие документы.
+            models.Index(
+                fields=["upload"],
+                name="filesearch_pending_idx",
+                condition=models.Q(status="pending"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.upload_id} ({self.get_status_display()})"
+
+
+def _month_key(value):
+    return timezone.localtime(value).strftime("%Y-%m")
+
+
+def _bump(buckets, key, count, size):
+    bucket = buckets.setdefault(key, {"count": 0, "size": 0})
+    bucket["count"] += count
+    bucket["size"] += size
+    if bucket["count"] <= 0:
+        del buckets[key]
+
+
+class UserFileStatsManager(models.Manager):
+    def compute(self, user_ids):
+        """Считает статистику пользователей заново по UploadFile (без сохранения)."""
+        stats = {user_id: self.model(user_id=user_id) for user_id in user_ids}
+        files = UploadFile.objects.filter(user_id__in=user_ids).order_by()
+        for user_id, category, count, size in (
+            files.values_list("user_id", "category")
+            .annotate(count=Count("pk"), total=Sum("size"))
+            .values_list("user_id", "category", "count", "total")
+        ):
+            stats[user_id].file_count += count
+            stats[user_id].total_size += size or 0
+            _bump(stats[user_id].by_category, category or "other", count, size or 0)
+        for user_id, month, count, size in (
+            files.annotate(month=TruncMonth("uploaded_at"))
+            .values_list("user_id", "month")
+            .annotate(count=Count("pk"), total=Sum("size"))
+            .values_list("user_id", "month", "count", "total")
+        ):
+            _bump(stats[user_id].by_month, _month_key(month), count, size or 0)
+        largest = files.annotate(
+            row=Window(
+                RowNumber(),
+                partition_by=F("user_id"),
+                order_by=[F("size").desc(nulls_last=True), F("pk").desc()],
+            )
+        ).filter(row__lte=settings.STATS_LARGEST_FILES)
+        for user_id, *entry in largest.order_by("user_id", "row").values_list(
+            "user_id", "pk", "slug", "original_name", "size"
+        ):
+            stats[user_id].largest.append(UserFileStats.largest_entry(*entry))
+        return stats
+
+    def rebuild(self, user_id):
+        stats = self.compute([user_id])[user_id]
+        # Строку мог одновременно создать другой запрос — тогда оставляем его.
+        self.bulk_create([stats], ignore_conflicts=True)
+        return stats
+
+    def for_user(self, user):
+        # Строку статистики создает первое чтение: до него счетчики не ведутся.
+        return self.filter(pk=user.pk).first() or self.rebuild(user.pk)
+
+    def _update(self, items_by_user, apply):
+        # Строки блокируются по возрастанию user_id, чтобы параллельные
+        # массовые операции не ждали друг друга по кругу.
+        for user_id in sorted(items_by_user):
+            stats = self.select_for_update().filter(pk=user_id).first()
+            if stats is not None:
+                apply(stats, items_by_user[user_id])
+                stats.save()
+
+    def record_uploads(self, uploads):
+        by_user = defaultdict(list)
+        for upload in uploads:
+            by_user[upload.user_id].append(upload)
+        self._update(by_user, UserFileStats.add_uploads)
+
+    def record_deletes(self, rows):
+        """rows: (user_id, pk, category, size, uploaded_at) удаленных файлов."""
+        by_user = defaultdict(list)
+        for user_id, *row in rows:
+            by_user[user_id].append(row)
+        self._update(by_user, UserFileStats.remove_uploads)
+
+
+class UserFileStats(models.Model):
+    """
+    Материализованная статистика файлов пользователя: объем по категориям,
+    загрузки по месяцам и самые большие файлы. Обновляется при загрузке и
+    удалении, пересчитывается командой rebuild_file_stats.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="file_stats",
+    )
+    file_count = models.PositiveIntegerField("Файлов", default=0)
+    total_size = models.BigIntegerField("Объем (байт)", default=0)
+    # {"image": {"count": 3, "size": 1024}, ...}
+    by_category = models.JSONField("По категориям", default=dict)
+    # {"2025-01": {"count": 3, "size": 1024}, ...}
+    by_month = models.JSONField("По месяцам", default=dict)
+    # [{"id": 1, "slug": "...", "name": "...", "size": 1024}, ...] по убыванию размера
+    largest = models.JSONField("Самые большие файлы", default=list)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    objects = UserFileStatsManager()
+
+    class Meta:
+        verbose_name = "Статистика файлов"
+        verbose_name_plural = "Статистика файлов"
+
+    @staticmethod
+    def largest_entry(pk, slug, name, size):
+        return {"id": pk, "slug": slug, "name": name, "size": size or 0}
+
+    def _count(self, category, uploaded_at, count, size):
+        self.file_count += count
+        self.total_size += size
+        _bump(self.by_category, category or "other", count, size)
+        _bump(self.by_month, _month_key(uploaded_at), count, size)
+
+    def add_uploads(self, uploads):
+        for upload in uploads:
+            self._count(upload.category, upload.uploaded_at, 1, upload.size or 0)
+            self.largest.append(
+                self.largest_entry(
+                    upload.pk, upload.slug, upload.original_name, upload.size
+                )
+            )
+        self.largest.sort(key=lambda entry: (-entry["size"], -entry["id"]))
+        del self.largest[settings.STATS_LARGEST_FILES :]
+
+    def remove_uploads(self, rows):
+        removed = set()
+        for pk, category, size, uploaded_at in rows:
+            self._count(category, uploaded_at, -1, -(size or 0))
+            removed.add(pk)
+        if any(entry["id"] in removed for entry in self.largest):
+            # Удален один из самых больших файлов: список добираем запросом.
+            self.largest = [
+                self.largest_entry(*entry)
+                for entry in UploadFile.objects.filter(user_id=self.user_id)
+                .order_by(F("size").desc(nulls_last=True), "-pk")
+                .values_list("pk", "slug", "original_name", "size")[
+                    : settings.STATS_LARGEST_FILES
+                ]
+            ]
+
+    def as_dict(self):
+        return {
+            "file_count": self.file_count,
+            "total_size": self.total_size,
+            "categories": [
+                {
+                    "category": category,
+                    "label": CATEGORY_LABELS.get(category, category),
+                    **bucket,
+                }
+                for category, bucket in sorted(
+                    self.by_category.items(), key=lambda item: -item[1]["size"]
+                )
+            ],
+            "months": [
+                {"month": month, **bucket}
+                for month, bucket in sorted(self.by_month.items())
+            ],
+            "largest": [
+                {
+                    **entry,
+                    "url": reverse("uploader:file_detail", args=[entry["slug"]]),
+                }
+                for entry in self.largest
+            ],
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class ChunkedUpload(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chunked_uploads",
+    )
+    upload_id = models.SlugField("ID загрузки", max_length=64, unique=True)
+    original_name = models.CharField("Имя файла", max_length=255)
+    total_size = models.BigIntegerField("Ожидаемый размер (байт)")
+    created_at = models.DateTimeField("Начало загрузки", auto_now_add=True)
+    updated_at = models.DateTimeField("Последняя часть", auto_now=True)
+    # Продлевается каждой частью; брошенные загрузки удаляет uploader.cleanup.
+    expires_at = models.DateTimeField("Истекает", db_index=True)
+
+    class Meta:
+        verbose_name = "Загрузка по частям"
+        verbose_name_plural = "Загрузки по частям"
+
+    def __str__(self):
+        return f"{self.original_name} ({self.upload_id})"
+
+    def save(self, *args, **kwargs):
+        if not self.upload_id:
+            self.upload_id = shortuuid.uuid()
+        self.expires_at = timezone.now() + timedelta(
+            seconds=settings.FILE_UPLOAD_CHUNKED_EXPIRY
+        )
+        super().save(*args, **kwargs)
+
+    @property
+    def staging_path(self):
+        return os.path.join(settings.FILE_UPLOAD_STAGING_DIR, f"{self.upload_id}.part")
+
+    @property
+    def offset(self):
+        # Размер staging-файла на диске — единственный источник правды о смещении:
+        # он не может разойтись с реально записанными байтами.
+        try:
+            return os.path.getsize(self.staging_path)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def is_complete(self):
+        return self.offset == self.total_size
+
+    def append_chunk(self, stream, length, block_size=64 * 1024):
+        os.makedirs(settings.FILE_UPLOAD_STAGING_DIR, exist_ok=True)
+        written = 0
+        with open(self.staging_path, "ab") as staging:
+            while written < length:
+                data = stream.read(min(block_size, length - written))
+                if not data:
+                    break
+                staging.write(data)
+                written += len(data)
+        return written
+
+    def open_staged(self):
+        staged = StagedUploadedFile(self.staging_path, self.original_name, self.offset)
+        return inspect_file(staged)
+
+    def discard(self):
+        try:
+            os.remove(self.staging_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(upload):
+    raw = f"{upload.uploaded_at.isoformat()}|{upload.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        uploaded_at, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(uploaded_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор страницы")
+
+
+def keyset_queryset(queryset, cursor=None):
+    """
+    Файлы в порядке (-uploaded_at, -id), начиная после курсора. Фильтр по
+    курсору опирается на индекс, поэтому дальние страницы стоят столько же,
+    сколько первая (в отличие от OFFSET).
+    """
+    queryset = queryset.order_by("-uploaded_at", "-id")
+    if cursor:
+        uploaded_at, pk = decode_cursor(cursor)
+        # uploaded_at__lte дублирует условие, зато становится границей
+        # диапазона в индексе, а не фильтром поверх всех строк.
+        queryset = queryset.filter(
+            Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk),
+            uploaded_at__lte=uploaded_at,
+        )
+    return queryset
+
+
+def _split_page(items, page_size):
+    next_cursor = (
+        encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+    )
+    return items[:page_size], next_cursor
+
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    items = list(keyset_queryset(queryset, cursor)[: page_size + 1])
+    return _split_page(items, page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=50):
+    items = [item async for item in keyset_queryset(queryset, cursor)[: page_size + 1]]
+    return _split_page(items, page_size)
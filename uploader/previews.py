@@ -0,0 +1,135 @@
+import io
+import logging
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from fileflow.background import BackgroundQueue
+
+from .models import FilePreview
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:
+    convert_from_path = None
+
+logger = logging.getLogger(__name__)
+
+queue = BackgroundQueue("preview", "PREVIEW_WORKERS")
+
+
+def _encode_image(image):
+    image.thumbnail((settings.PREVIEW_MAX_SIZE, settings.PREVIEW_MAX_SIZE))
+    buffer = io.BytesIO()
+    if features.check("webp"):
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(buffer, "WEBP", quality=80)
+        return buffer.getvalue(), "webp"
+    image.convert("RGB").save(buffer, "JPEG", quality=80, optimize=True)
+    return buffer.getvalue(), "jpg"
+
+
+def _render_image(upload):
+    with upload.open_content() as source:
+        with Image.open(source) as image:
+            # draft() позволяет декодеру JPEG сразу читать уменьшенную копию.
+            image.draft("RGB", (settings.PREVIEW_MAX_SIZE, settings.PREVIEW_MAX_SIZE))
+            return _encode_image(image)
+
+
+def _render_pdf_file(path):
+    pages = convert_from_path(
+        path,
+        first_page=1,
+        last_page=1,
+        size=(settings.PREVIEW_MAX_SIZE, None),
+    )
+    return _encode_image(pages[0])
+
+
+def _render_pdf(upload):
+    try:
+        path = upload.file.path
+    except NotImplementedError:
+        # Объектное хранилище: pdftoppm нужен локальный файл.
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as local:
+            with upload.open_content() as source:
+                shutil.copyfileobj(source, local)
+            local.flush()
+            return _render_pdf_file(local.name)
+    return _render_pdf_file(path)
+
+
+def _render_text(upload):
+    with upload.open_content() as source:
+        head = source.read(settings.PREVIEW_TEXT_BYTES)
+    return head.decode("utf-8", errors="replace")
+
+
+def generate_preview(preview):
+    upload = preview.upload
+    if upload.is_image and Image is not None:
+        data, extension = _render_image(upload)
+    elif upload.is_pdf and Image is not None and convert_from_path is not None:
+        data, extension = _render_pdf(upload)
+    elif upload.is_text:
+        preview.text = _render_text(upload)
+        preview.status = FilePreview.STATUS_READY
+        preview.save(update_fields=["text", "status", "updated_at"])
+        return preview
+    else:
+        preview.status = FilePreview.STATUS_UNSUPPORTED
+        preview.save(update_fields=["status", "updated_at"])
+        return preview
+    preview.image.save(f"{upload.slug}.{extension}", ContentFile(data), save=False)
+    preview.status = FilePreview.STATUS_READY
+    preview.save(update_fields=["image", "status", "updated_at"])
+    return preview
+
+
+def process_preview(preview_id):
+    with transaction.atomic():
+        # skip_locked: превью уже строит другой воркер. of=("self",) не
+        # блокирует сам файл, пока строится превью.
+        preview = (
+            FilePreview.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("upload")
+            .filter(pk=preview_id, status=FilePreview.STATUS_PENDING)
+            .first()
+        )
+        if preview is None:
+            return
+        try:
+            with transaction.atomic():
+                generate_preview(preview)
+        except Exception as e:
+            logger.exception("Не удалось построить превью для %s", preview.upload.slug)
+            preview.status = FilePreview.STATUS_FAILED
+            preview.error = str(e)[:255]
+            preview.save(update_fields=["status", "error", "updated_at"])
+
+
+def schedule_previews(uploads):
+    previews = FilePreview.objects.bulk_create(
+        [FilePreview(upload=upload) for upload in uploads if upload.needs_preview]
+    )
+    queue.map(process_preview, [(preview.pk,) for preview in previews])
+    return previews
+
+
+def schedule_preview(upload):
+    if not upload.needs_preview:
+        return None
+    preview, created = FilePreview.objects.get_or_create(upload=upload)
+    if created:
+        queue.submit(process_preview, preview.pk)
+    return preview
@@ -0,0 +1,183 @@
+import logging
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.utils import timezone
+
+from fileflow.background import BackgroundQueue
+
+from .models import FileSearchDocument, UploadFile
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 3
+PDF_TEXT_TIMEOUT = 60
+
+queue = BackgroundQueue("search", "SEARCH_INDEX_WORKERS")
+
+
+def _is_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def _pdf_text(path):
+    result = subprocess.run(
+        ["pdftotext", "-q", "-enc", "UTF-8", path, "-"],
+        capture_output=True,
+        timeout=PDF_TEXT_TIMEOUT,
+        check=True,
+    )
+    return result.stdout[: settings.SEARCH_TEXT_MAX_BYTES]
+
+
+def _extract_pdf(upload):
+    try:
+        path = upload.file.path
+    except NotImplementedError:
+        # Объектное хранилище: pdftotext нужен локальный файл.
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as local:
+            with upload.open_content() as source:
+                shutil.copyfileobj(source, local)
+            local.flush()
+            return _pdf_text(local.name)
+    return _pdf_text(path)
+
+
+def extract_text(upload):
+    if upload.is_pdf:
+        data = _extract_pdf(upload)
+    else:
+        with upload.open_content() as source:
+            data = source.read(settings.SEARCH_TEXT_MAX_BYTES)
+    # NUL не допускается в текстовых полях PostgreSQL.
+    return data.decode("utf-8", errors="replace").replace("\x00", "")
+
+
+def index_document(document):
+    text = extract_text(document.upload)
+    fields = {
+        "content": text,
+        "status": FileSearchDocument.STATUS_READY,
+        "error": "",
+        "updated_at": timezone.now(),
+    }
+    documents = FileSearchDocument.objects.filter(pk=document.pk)
+    with transaction.atomic():
+        documents.update(**fields)
+        if _is_postgresql():
+            # tsvector считается из уже сохраненной колонки content, поэтому
+            # текст не передается в базу второй раз.
+            documents.update(
+                vector=SearchVector("content", config=settings.SEARCH_CONFIG)
+            )
+
+
+def process_document(upload_id):
+    with transaction.atomic():
+        # skip_locked: документ уже индексирует другой воркер.
+        document = (
+            FileSearchDocument.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("upload__blob")
+            .filter(pk=upload_id, status=FileSearchDocument.STATUS_PENDING)
+            .first()
+        )
+        if document is None:
+            return
+        try:
+            with transaction.atomic():
+                index_document(document)
+        except Exception as e:
+            logger.exception(
+                "Не удалось проиндексировать файл %s", document.upload.slug
+            )
+            FileSearchDocument.objects.filter(pk=upload_id).update(
+                status=FileSearchDocument.STATUS_FAILED,
+                error=str(e)[:255],
+                updated_at=timezone.now(),
+            )
+
+
+def schedule_indexing(uploads):
+    documents = FileSearchDocument.objects.bulk_create(
+        [
+            FileSearchDocument(upload=upload, user_id=upload.user_id)
+            for upload in uploads
+            if upload.is_searchable
+        ],
+        ignore_conflicts=True,
+    )
+    queue.map(process_document, [(document.pk,) for document in documents])
+    return documents
+
+
+def _name_matches(user, query):
+    # icontains дает UPPER(original_name) LIKE UPPER('%...%'): на PostgreSQL
+    # это условие обслуживает триграммный индекс uploadfile_name_trgm_idx.
+    files = UploadFile.objects.filter(user=user, original_name__icontains=query)
+    if _is_postgresql():
+        files = files.annotate(
+            rank=TrigramWordSimilarity(query, "original_name")
+        ).order_by("-rank", "-pk")
+    else:
+        files = files.annotate(rank=Value(1.0)).order_by("-pk")
+    return files.values_list("pk", "rank")[: settings.SEARCH_MAX_RESULTS]
+
+
+def _content_matches(user, query):
+    documents = FileSearchDocument.objects.filter(
+        user=user, status=FileSearchDocument.STATUS_READY
+    )
+    if _is_postgresql():
+        search_query = SearchQuery(
+            query, config=settings.SEARCH_CONFIG, search_type="websearch"
+        )
+        documents = (
+            documents.filter(vector=search_query)
+            .annotate(rank=SearchRank(F("vector"), search_query))
+            .order_by("-rank", "-pk")
+        )
+    else:
+        documents = (
+            documents.filter(content__icontains=query)
+            .annotate(rank=Value(0.5))
+            .order_by("-pk")
+        )
+    return documents.values_list("pk", "rank")[: settings.SEARCH_MAX_RESULTS]
+
+
+def search_files(user, query, page=1):
+    """
+    Файлы пользователя, найденные по имени и по тексту, по убыванию
+    релевантности. Возвращает страницу файлов (с атрибутом rank) и признак
+    следующей страницы.
+    """
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return [], False
+    # Обе выборки идут по своим GIN-индексам и ограничены SEARCH_MAX_RESULTS,
+    # а объединяются здесь: совпадение и в имени, и в тексте поднимает файл выше.
+    ranks = {}
+    for matches in (_name_matches(user, query), _content_matches(user, query)):
+        for pk, rank in matches:
+            ranks[pk] = ranks.get(pk, 0) + rank
+    ordered = sorted(ranks, key=lambda pk: (-ranks[pk], -pk))
+    page_size = settings.SEARCH_PAGE_SIZE
+    start = (page - 1) * page_size
+    page_ids = ordered[start : start + page_size]
+    files = UploadFile.objects.in_bulk(page_ids)
+    results = []
+    for pk in page_ids:
+        if pk in files:
+            files[pk].rank = ranks[pk]
+            results.append(files[pk])
+    return results, len(ordered) > start + page_size
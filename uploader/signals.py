@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import UploadFile, queue_rolled_back_blob_files
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_files(sender, instance, **kwargs):
+    # Каскад от пользователя удаляет строки файлов напрямую и обходит
+    # UploadFileQuerySet.delete(): без этого ссылки на blob не уменьшатся,
+    # а файлы и превью не попадут в очередь StorageCleanup.
+    UploadFile.objects.filter(user=instance).delete()
+
+
+request_finished.connect(queue_rolled_back_blob_files)
@@ -0,0 +1,221 @@
+import io
+import mimetypes
+import posixpath
+
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+MISSING_OBJECT_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+class S3ObjectReader(io.RawIOBase):
+    """
+    Объект S3 как файл только для чтения. Последовательное чтение идет одним
+    GET с Range от текущей позиции, seek() в другое место открывает новый.
+    """
+
+    def __init__(self, client, bucket, key, size):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._size = size
+        self._pos = 0
+        self._body = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("Отрицательная позиция в файле")
+        if offset != self._pos:
+            self._close_body()
+            self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._pos >= self._size or not len(buffer):
+            return 0
+        if self._body is None:
+            response = self._client.get_object(
+                Bucket=self._bucket, Key=self._key, Range=f"bytes={self._pos}-"
+            )
+            self._body = response["Body"]
+        data = self._body.read(len(buffer))
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _close_body(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def close(self):
+        self._close_body()
+        super().close()
+
+
+class S3File(File):
+    def __init__(self, storage, name, size):
+        self._storage = storage
+        super().__init__(storage._reader(name, size), name=name)
+        self.size = size
+
+    def open(self, mode=None):
+        # File.open() умеет открывать заново только локальные файлы.
+        if self.closed:
+            self.file = self._storage._reader(self.name, self.size)
+        else:
+            self.seek(0)
+        return self
+
+
+@deconstructible(path="uploader.storage.S3Storage")
+class S3Storage(Storage):
+    """
+    Хранилище в S3-совместимом объектном хранилище (AWS S3, MinIO и т. п.).
+    Большие файлы загружаются по частям (multipart upload), скачивание идет
+    по подписанным ссылкам из url().
+    """
+
+    def __init__(
+        self,
+        bucket_name=None,
+        endpoint_url=None,
+        region_name=None,
+        access_key=None,
+        secret_key=None,
+        location="",
+        addressing_style=None,
+        querystring_expire=300,
+        multipart_threshold=16 * 1024 * 1024,
+        multipart_chunksize=16 * 1024 * 1024,
+        read_buffer_size=1024 * 1024,
+    ):
+        if boto3 is None:
+            raise ImproperlyConfigured(
+                "Для FILE_STORAGE=s3 нужен пакет boto3 (pip install boto3)"
+            )
+        if not bucket_name:
+            raise ImproperlyConfigured("Не задан S3_BUCKET")
+        self.bucket_name = bucket_name
+        self.location = location.strip("/")
+        self.querystring_expire = querystring_expire
+        self.read_buffer_size = read_buffer_size
+        # Отдельная сессия: сессия boto3 по умолчанию не потокобезопасна,
+        # а сам клиент можно делить между потоками.
+        self.client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(
+                # MinIO и другие локальные хранилища обычно требуют "path".
+                s3={"addressing_style": addressing_style or "auto"},
+                signature_version="s3v4",
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+        )
+
+    def _key(self, name):
+        name = name.replace("\\", "/").lstrip("/")
+        return posixpath.join(self.location, name) if self.location else name
+
+    def _head(self, name):
+        return self.client.head_object(Bucket=self.bucket_name, Key=self._key(name))
+
+    def _reader(self, name, size):
+        reader = S3ObjectReader(self.client, self.bucket_name, self._key(name), size)
+        return io.BufferedReader(reader, self.read_buffer_size)
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError("S3Storage открывает файлы только для чтения")
+        return S3File(self, name, self.size(name))
+
+    def _save(self, name, content):
+        if hasattr(content, "seek"):
+            content.seek(0)
+        content_type = (
+            getattr(content, "content_type", None)
+            or mimetypes.guess_type(name)[0]
+            or "application/octet-stream"
+        )
+        # upload_fileobj сам переходит на multipart upload после
+        # multipart_threshold и загружает части параллельно.
+        self.client.upload_fileobj(
+            content,
+            self.bucket_name,
+            self._key(name),
+            ExtraArgs={"ContentType": content_type},
+            Config=self.transfer_config,
+        )
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Имена уникальны по построению (uploader.models): без проверки
+        # exists(), которая стоила бы лишнего HEAD-запроса на каждую запись.
+        validate_file_name(name, allow_relative_path=True)
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f"Имя файла {name!r} длиннее {max_length} символов"
+            )
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=self._key(name))
+
+    def exists(self, name):
+        try:
+            self._head(name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in MISSING_OBJECT_CODES:
+                return False
+            raise
+        return True
+
+    def size(self, name):
+        return self._head(name)["ContentLength"]
+
+    def get_modified_time(self, name):
+        return self._head(name)["LastModified"]
+
+    def url(self, name, expire=None, response_headers=None):
+        """
+        Подписанная ссылка на объект. response_headers (Content-Disposition,
+        Content-Type и т. п.) хранилище подставит в ответ вместо своих.
+        """
+        params = {"Bucket": self.bucket_name, "Key": self._key(name)}
+        for header, value in (response_headers or {}).items():
+            params["Response" + header.replace("-", "")] = value
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params=params,
+            ExpiresIn=expire or self.querystring_expire,
+        )
@@ -1,3 +1,1172 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import importlib
+import io
+import os
+import secrets
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import SkipFile
+from django.core.management import CommandError, call_command
+
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+
+from accounts.models import PLAN_LIMITS, CustomUser
+from payment.entitlements import get_entitlement
+from . import checks, previews, views
+from . import urls as uploader_urls
+from .cleanup import collect_orphan_blobs, reap_storage
+from .downloads import _get_backend, parse_range_header
+from .handlers import InspectingTemporaryFileUploadHandler
+from .models import (
+    Blob,
+    ChunkedUpload,
+    FilePreview,
+    FileSearchDocument,
+    StorageCleanup,
+    UploadFile,
+    UserFileStats,
+    classify_file,
+    preview_upload_to,
+)
+from .pagination import keyset_page, keyset_queryset
+from .search import search_files
+from .storage import S3Storage, boto3
+
+USERS = 200
+FILES_PER_USER = 100
+EXTENSIONS = ["pdf", "jpg", "txt", "zip", "mp4", "docx", "csv", "exe"]
+CONTENT_TYPES = [
+    "application/pdf",
+    "image/jpeg",
+    "text/plain",
+    "application/zip",
+    "video/mp4",
+    "application/octet-stream",
+]
+
+
+class FileCategoryTests(SimpleTestCase):
+    def test_specific_label_is_kept_next_to_category(self):
+        for content_type, extension, label, category in [
+            (
+                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                "docx",
+                "Документ Word",
+                "document",
+            ),
+            ("application/vnd.ms-excel", "xls", "Таблица Excel", "spreadsheet"),
+            ("application/x-rar-compressed", "rar", "Архив RAR", "archive"),
+            ("", "csv", "Таблица/CSV", "spreadsheet"),
+            ("image/png", "png", "Изображение", "image"),
+        ]:
+            upload = UploadFile(
+                content_type=content_type,
+                extension=extension,
+                category=classify_file(content_type, extension),
+            )
+            self.assertEqual(upload.file_category, label)
+            self.assertEqual(upload.category, category)
+
+
+@override_settings(PREVIEW_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class FileOwnershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", username="owner", password="secret"
+        )
+        cls.stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", username="stranger", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        self.client.post("/", {"file": SimpleUploadedFile("notes.txt", b"secret")})
+        self.upload = UploadFile.objects.get(user=self.owner)
+
+    def assertOnlyOwnerGets(self, url):
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_download(self):
+        self.assertOnlyOwnerGets(self.upload.get_download_url())
+
+    def test_inline(self):
+        self.assertOnlyOwnerGets(self.upload.get_inline_url())
+
+    def test_bulk_delete_answers_json_clients_with_json(self):
+        self.client.force_login(self.stranger)
+        response = self.client.post(
+            "/file/delete/", {"all": "1"}, HTTP_ACCEPT="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"deleted": 0})
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            "/file/delete/",
+            {"slugs": [self.upload.slug]},
+            HTTP_ACCEPT="*/*",
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertEqual(response.json(), {"deleted": 1})
+
+    def test_bulk_delete_redirects_browser_forms(self):
+        response = self.client.post(
+            "/file/delete/",
+            {"all": "1"},
+            HTTP_ACCEPT="text/html,application/xhtml+xml,*/*;q=0.8",
+        )
+        self.assertRedirects(response, "/file/all", fetch_redirect_response=False)
+        self.assertFalse(UploadFile.objects.filter(user=self.owner).exists())
+
+    def test_detail_and_preview(self):
+        FilePreview.objects.filter(upload=self.upload).update(
+            status=FilePreview.STATUS_READY, image="previews/notes.webp"
+        )
+        self.assertOnlyOwnerGets(self.upload.get_view_url())
+        self.client.force_login(self.owner)
+        self.assertOnlyOwnerGets(f"/file/{self.upload.slug}/preview/status/")
+        self.client.force_login(self.stranger)
+        response = self.client.get(f"/file/{self.upload.slug}/preview/")
+        self.assertEqual(response.status_code, 404)
+
+
+class RangeHeaderTests(SimpleTestCase):
+    def test_parse_range_header(self):
+        for header, expected in [
+            ("bytes=0-99", [(0, 99)]),
+            ("bytes=900-", [(900, 999)]),
+            ("bytes=-100", [(900, 999)]),
+            ("bytes=-5000", [(0, 999)]),
+            ("bytes=500-5000", [(500, 999)]),
+            ("bytes=50-59, 0-9,5-20", [(0, 20), (50, 59)]),
+            ("bytes=0-9,10-19", [(0, 19)]),
+            ("bytes=1000-", []),
+            ("bytes=1000-1010,2000-", []),
+            ("bytes=5-1", None),
+            ("bytes=-", None),
+            ("bytes=a-b", None),
+            ("items=0-9", None),
+            ("", None),
+            (None, None),
+            ("bytes=" + ",".join(f"{i * 10}-{i * 10}" for i in range(17)), None),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range_header(header, 1000), expected)
+
+
+@override_settings(PREVIEW_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class ConditionalDownloadTests(TestCase):
+    DATA = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="ranges@example.com", username="ranges", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.client.post("/", {"file": SimpleUploadedFile("data.bin", self.DATA)})
+        self.upload = UploadFile.objects.get(user=self.user)
+        self.url = self.upload.get_download_url()
+
+    def get(self, **headers):
+        response = self.client.get(
+            self.url,
+            headers={name.replace("_", "-"): value for name, value in headers.items()},
+        )
+        response.body = b"".join(response) if response.status_code != 304 else b""
+        return response
+
+    def test_single_and_suffix_ranges(self):
+        response = self.get(Range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(response.body, self.DATA[10:20])
+
+        response = self.get(Range="bytes=-24")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 1000-1023/1024")
+        self.assertEqual(response.body, self.DATA[-24:])
+
+    def test_multiple_ranges(self):
+        response = self.get(Range="bytes=100-109,0-4")
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response["Content-Type"].startswith("multipart/byteranges"))
+        self.assertEqual(int(response["Content-Length"]), len(response.body))
+        boundary = response["Content-Type"].split("boundary=")[1]
+        parts = response.body.split(f"--{boundary}".encode())
+        self.assertEqual(parts[-1], b"--\r\n")
+        self.assertIn(
+            b"Content-Range: bytes 0-4/1024\r\n\r\n" + self.DATA[:5], parts[1]
+        )
+        self.assertIn(
+            b"Content-Range: bytes 100-109/1024\r\n\r\n" + self.DATA[100:110], parts[2]
+        )
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range="bytes=1024-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_invalid_range_serves_whole_file(self):
+        response = self.get(Range="bytes=20-10")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.DATA)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_if_none_match(self):
+        response = self.get(If_None_Match=self.upload.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.upload.etag)
+        response = self.get(If_None_Match='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range(self):
+        response = self.get(Range="bytes=0-9", If_Range=self.upload.etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(Range="bytes=0-9", If_Range=response["Last-Modified"])
+        self.assertEqual(response.status_code, 206)
+
+        # Файл изменился с тех пор, как клиент получил первые байты: заново целиком.
+        response = self.get(Range="bytes=0-9", If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.DATA)
+        response = self.get(Range="bytes=0-9", If_Range="Mon, 01 Jan 2001 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_backend_must_match_storage(self):
+        # Базовый Storage, как и S3Storage, не дает локальных путей к файлам.
+        remote = Storage()
+        for backend, storage, ok in [
+            ("sendfile", remote, False),
+            ("x-sendfile", remote, False),
+            ("x-accel-redirect", remote, True),
+            ("presigned-redirect", default_storage, False),
+            ("sendfile", default_storage, True),
+        ]:
+            with self.subTest(backend=backend), self.settings(DOWNLOAD_BACKEND=backend):
+                with mock.patch.object(checks, "default_storage", storage):
+                    errors = checks.check_download_backend(None)
+                self.assertEqual(
+                    [error.id for error in errors], [] if ok else ["uploader.E001"]
+                )
+        with self.settings(DOWNLOAD_BACKEND="x-sendfile"), mock.patch.object(
+            self.upload.file, "storage", remote
+        ):
+            with self.assertRaises(ImproperlyConfigured):
+                _get_backend(self.upload)
+
+
+def _reload_uploader_urls():
+    importlib.reload(uploader_urls)
+    # include() в корневом urlconf кэширует маршруты приложения.
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(PREVIEW_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class AsyncViewTests(TestCase):
+    DATA = b"0123456789" * 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Представления выбираются в uploader.urls при импорте. Очистка идет
+        # в обратном порядке: маршруты перечитываются уже без ASYNC_VIEWS.
+        cls.addClassCleanup(_reload_uploader_urls)
+        cls.enterClassContext(override_settings(ASYNC_VIEWS=True))
+        _reload_uploader_urls()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="async@example.com", username="async", password="secret"
+        )
+        cls.stranger = CustomUser.objects.create_user(
+            email="async-other@example.com", username="async-other", password="x"
+        )
+        cls.upload = UploadFile.objects.create(
+            user=cls.owner, file=ContentFile(cls.DATA, name="digits.txt")
+        )
+        UploadFile.objects.create(
+            user=cls.stranger, file=ContentFile(b"other", name="foreign.txt")
+        )
+
+    async def get(self, url, user=None, **headers):
+        await self.async_client.aforce_login(user or self.owner)
+        response = await self.async_client.get(url, headers=headers)
+        if response.streaming:
+            # Асинхронное представление отдает файл асинхронным итератором.
+            response.body = b"".join(
+                [chunk async for chunk in response.streaming_content]
+            )
+        return response
+
+    def test_routes_use_async_views(self):
+        self.assertIs(resolve("/file/all").func, views.all_file_details_async)
+        self.assertIs(
+            resolve(self.upload.get_download_url()).func, views.file_download_async
+        )
+
+    async def test_file_lists_show_only_own_files(self):
+        response = await self.get("/file/all")
+        self.assertContains(response, "digits.txt")
+        self.assertNotContains(response, "foreign.txt")
+        response = await self.get("/file/page/?format=json")
+        self.assertEqual(
+            [file["slug"] for file in response.json()["files"]], [self.upload.slug]
+        )
+
+    async def test_detail_and_download_only_for_owner(self):
+        response = await self.get(self.upload.get_view_url())
+        self.assertContains(response, "digits.txt")
+        response = await self.get(self.upload.get_view_url(), self.stranger)
+        self.assertEqual(response.status_code, 404)
+        response = await self.get(self.upload.get_download_url(), self.stranger)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_download_streams_file_and_ranges(self):
+        response = await self.get(self.upload.get_download_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.DATA)
+        self.assertEqual(int(response["Content-Length"]), len(self.DATA))
+
+        response = await self.get(self.upload.get_download_url(), Range="bytes=5-14")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, self.DATA[5:15])
+
+        response = await self.get(
+            self.upload.get_download_url(), If_None_Match=self.upload.etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_anonymous_user_is_sent_to_login(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(self.upload.get_download_url())
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response["Location"].startswith("/accounts/login/"))
+
+
+@override_settings(
+    PREVIEW_WORKERS=0,
+    STORAGE_REAPER_WORKERS=0,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    FILE_UPLOAD_STAGING_DIR=tempfile.mkdtemp(),
+)
+class ChunkedUploadTests(TestCase):
+    DATA = b"0123456789" * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="chunks@example.com", username="chunks", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def init(self, size=None):
+        response = self.client.post(
+            "/upload/", {"filename": "big.txt", "size": size or len(self.DATA)}
+        )
+        self.assertEqual(response.status_code, 201)
+        return f"/upload/{response.json()['upload_id']}/"
+
+    def put(self, url, offset, data):
+        return self.client.put(
+            url,
+            data,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks_and_resume(self):
+        url = self.init()
+        response = self.put(url, 0, self.DATA[:400])
+        self.assertEqual(response["Upload-Offset"], "400")
+
+        # Клиент потерял ответ и повторяет часть со старым смещением.
+        response = self.put(url, 0, self.DATA[:400])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 400)
+
+        response = self.client.post(url + "complete/")
+        self.assertEqual(response.status_code, 409)
+
+        # Возобновление: смещение узнаем у сервера.
+        self.assertEqual(self.client.head(url)["Upload-Offset"], "400")
+        self.put(url, 400, self.DATA[400:])
+        response = self.client.post(url + "complete/")
+        self.assertEqual(response.status_code, 201)
+        upload = UploadFile.objects.get(slug=response.json()["slug"])
+        with upload.open_content() as fileobj:
+            self.assertEqual(fileobj.read(), self.DATA)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_chunk_beyond_declared_size_is_rejected(self):
+        url = self.init(size=100)
+        response = self.put(url, 0, self.DATA[:101])
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_abandoned_uploads_are_expired(self):
+        stale_url = self.init()
+        self.put(stale_url, 0, self.DATA[:10])
+        stale = ChunkedUpload.objects.get()
+        ChunkedUpload.objects.filter(pk=stale.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.init()
+
+        self.assertEqual(reap_storage()[2], 1)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=stale.pk).exists())
+        self.assertFalse(os.path.exists(stale.staging_path))
+        self.assertEqual(ChunkedUpload.objects.count(), 1)
+
+
+@override_settings(
+    PREVIEW_WORKERS=0, STORAGE_REAPER_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class ShardedPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="shards@example.com", username="shards", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertSharded(self, path, prefix, key, name):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        self.assertEqual(path, f"{prefix}/{digest[:2]}/{digest[2:4]}/{name}")
+
+    def test_upload_and_preview_paths(self):
+        upload = UploadFile.objects.create(
+            user=self.user, file=ContentFile(b"legacy", name="Notes.TXT")
+        )
+        self.assertSharded(
+            upload.file.name, "uploads", upload.slug, f"{upload.slug}.txt"
+        )
+        self.assertSharded(
+            preview_upload_to(None, f"{upload.slug}.webp"),
+            "previews",
+            f"{upload.slug}.webp",
+            f"{upload.slug}.webp",
+        )
+
+    def test_blob_path_of_reuploaded_content_is_new(self):
+        data = b"same bytes"
+        sha256 = hashlib.sha256(data).hexdigest()
+        self.client.post("/", {"file": SimpleUploadedFile("a.txt", data)})
+        first = UploadFile.objects.get().file.name
+        self.assertRegex(
+            first, rf"^blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}-[0-9a-f]{{8}}$"
+        )
+        UploadFile.objects.all().delete()
+        collect_orphan_blobs(batch_size=10)
+        # Старый файл ждет удаления в StorageCleanup: новый blob с тем же
+        # содержимым не должен попасть на его путь.
+        self.assertEqual(
+            list(StorageCleanup.objects.values_list("path", flat=True)), [first]
+        )
+        self.client.post("/", {"file": SimpleUploadedFile("b.txt", data)})
+        self.assertNotEqual(UploadFile.objects.get().file.name, first)
+
+    def test_saving_does_not_probe_for_free_names(self):
+        with mock.patch.object(
+            FileSystemStorage, "exists", side_effect=AssertionError("exists()")
+        ):
+            response = self.client.post(
+                "/", {"file": SimpleUploadedFile("a.txt", b"no probing")}
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(UploadFile.objects.exists())
+
+    def test_relocate_files_moves_legacy_paths(self):
+        upload = UploadFile.objects.create(
+            user=self.user, file=ContentFile(b"legacy", name="old.txt")
+        )
+        sharded = upload.file.name
+        default_storage.save("uploads/old.txt", ContentFile(b"legacy"))
+        UploadFile.objects.filter(pk=upload.pk).update(file="uploads/old.txt")
+
+        call_command("relocate_files", "--dry-run", stdout=io.StringIO())
+        upload.refresh_from_db()
+        self.assertEqual(upload.file.name, "uploads/old.txt")
+
+        call_command("relocate_files", stdout=io.StringIO())
+        upload.refresh_from_db()
+        self.assertEqual(upload.file.name, sharded)
+        with upload.file.open("rb") as fileobj:
+            self.assertEqual(fileobj.read(), b"legacy")
+        self.assertEqual(
+            list(StorageCleanup.objects.values_list("path", flat=True)),
+            ["uploads/old.txt"],
+        )
+        out = io.StringIO()
+        call_command("relocate_files", stdout=out)
+        self.assertIn("Moved 0 files", out.getvalue())
+
+    def test_relocate_files_resumes_each_model_separately(self):
+        upload = UploadFile.objects.create(
+            user=self.user, file=ContentFile(b"legacy", name="old.txt")
+        )
+        default_storage.save("uploads/old.txt", ContentFile(b"legacy"))
+        legacy_preview = default_storage.save(
+            f"previews/{upload.slug}.webp", ContentFile(b"webp")
+        )
+        UploadFile.objects.filter(pk=upload.pk).update(file="uploads/old.txt")
+        preview = FilePreview.objects.create(upload=upload, image=legacy_preview)
+
+        with self.assertRaises(CommandError):
+            call_command("relocate_files", "--after", str(upload.pk))
+
+        call_command(
+            "relocate_files",
+            "--model=files",
+            f"--after={upload.pk}",
+            stdout=io.StringIO(),
+        )
+        upload.refresh_from_db()
+        self.assertEqual(upload.file.name, "uploads/old.txt")
+
+        out = io.StringIO()
+        call_command("relocate_files", "--model=previews", stdout=out)
+        self.assertNotIn("files", out.getvalue())
+        preview.refresh_from_db()
+        self.assertSharded(
+            preview.image.name, "previews", f"{upload.slug}.webp", f"{upload.slug}.webp"
+        )
+        upload.refresh_from_db()
+        self.assertEqual(upload.file.name, "uploads/old.txt")
+
+
+@override_settings(
+    PREVIEW_WORKERS=0, STORAGE_REAPER_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class UserDeletionTests(TestCase):
+    def test_deleting_user_releases_blobs_and_queues_files(self):
+        user = CustomUser.objects.create_user(
+            email="leaving@example.com", username="leaving", password="secret"
+        )
+        self.client.force_login(user)
+        self.client.post("/", {"file": SimpleUploadedFile("a.txt", b"shared")})
+        blob = Blob.objects.get()
+        legacy = UploadFile.objects.create(
+            user=user, file="uploads/legacy.png", original_name="legacy.png"
+        )
+        FilePreview.objects.update_or_create(
+            upload=legacy, defaults={"image": "previews/legacy.webp"}
+        )
+
+        user.delete()
+
+        self.assertFalse(UploadFile.objects.exists())
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertEqual(
+            set(StorageCleanup.objects.values_list("path", flat=True)),
+            {"uploads/legacy.png", "previews/legacy.webp"},
+        )
+
+
+@override_settings(
+    PREVIEW_WORKERS=0, SEARCH_INDEX_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class BulkUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="bulk@example.com", username="bulk", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_folder_upload_shares_blobs_with_batched_lookups(self):
+        self.client.post("/", {"file": SimpleUploadedFile("old.txt", b"known")})
+        files = {
+            f"file_{i}": SimpleUploadedFile(f"{i}.txt", data)
+            for i, data in enumerate([b"same", b"same", b"known", b"new", b"newer"])
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/upload/bulk/",
+                {**files, "path_file_0": "docs/sub/0.txt"},
+            )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data["uploaded"], data["failed"]), (5, 0))
+        self.assertEqual(data["files"][0]["name"], "docs/sub/0.txt")
+
+        # Пять файлов — один SELECT ссылок и один после вставки нового содержимого.
+        blob_selects = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and '"uploader_blob"' in query["sql"]
+        ]
+        self.assertEqual(len(blob_selects), 2)
+        refs = dict(Blob.objects.values_list("sha256", "ref_count"))
+        for data, ref_count in [(b"same", 2), (b"known", 2), (b"new", 1)]:
+            self.assertEqual(refs[hashlib.sha256(data).hexdigest()], ref_count)
+        uploads = UploadFile.objects.filter(user=self.user)
+        self.assertEqual(uploads.count(), 6)
+        for upload in uploads:
+            with upload.open_content() as fileobj:
+                self.assertEqual(
+                    hashlib.sha256(fileobj.read()).hexdigest(), upload.blob.sha256
+                )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 5 + 4 + 4 + 5 + 3 + 5)
+
+    def test_files_over_the_quota_are_reported_one_by_one(self):
+        quota = PLAN_LIMITS["none"]["storage_quota"]
+        CustomUser.objects.filter(pk=self.user.pk).update(storage_used=quota - 6)
+        response = self.client.post(
+            "/upload/bulk/",
+            {
+                "file_0": SimpleUploadedFile("fits.txt", b"1234"),
+                "file_1": SimpleUploadedFile("too-big.txt", b"1234"),
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data["uploaded"], data["failed"]), (1, 1))
+        statuses = {file["name"]: file["status"] for file in data["files"]}
+        self.assertEqual(statuses, {"fits.txt": "ok", "too-big.txt": "error"})
+        self.assertEqual(list(Blob.objects.values_list("ref_count", flat=True)), [1])
+
+    def test_files_dropped_mid_stream_are_reported(self):
+        quota = PLAN_LIMITS["none"]["storage_quota"]
+        CustomUser.objects.filter(pk=self.user.pk).update(storage_used=quota - 1024)
+        response = self.client.post(
+            "/upload/bulk/",
+            {
+                "file_0": SimpleUploadedFile("big.bin", b"x" * 200 * 1024),
+                "file_1": SimpleUploadedFile("small.txt", b"fits"),
+            },
+        )
+        data = response.json()
+        self.assertEqual((data["uploaded"], data["failed"]), (1, 1))
+        self.assertEqual(data["files"][0]["name"], "big.bin")
+        self.assertIn("Недостаточно места", data["files"][0]["error"])
+
+
+@override_settings(PREVIEW_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class UploadQuotaTests(TestCase):
+    CHUNK = 64 * 1024
+    DATA = b"x" * (5 * CHUNK)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="quota@example.com", username="quota", password="secret"
+        )
+        quota = PLAN_LIMITS["none"]["storage_quota"]
+        CustomUser.objects.filter(pk=cls.user.pk).update(
+            storage_used=quota - 2 * cls.CHUNK
+        )
+
+    def test_handler_stops_reading_once_the_quota_is_exceeded(self):
+        request = RequestFactory().post("/")
+        request.user = CustomUser.objects.get(pk=self.user.pk)
+        request.entitlement = get_entitlement(request.user)
+        handler = InspectingTemporaryFileUploadHandler(request)
+        handler.new_file("file", "big.bin", "application/octet-stream", None)
+        self.assertIsNone(handler.receive_data_chunk(self.DATA[: self.CHUNK], 0))
+        self.assertIsNone(
+            handler.receive_data_chunk(self.DATA[: self.CHUNK], self.CHUNK)
+        )
+        # Третья часть уже не помещается: файл отбрасывается, не дочитываясь.
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(self.DATA[: self.CHUNK], 2 * self.CHUNK)
+        self.assertEqual(request.rejected_uploads, ["big.bin"])
+
+    def test_upload_over_the_quota_is_rejected_without_storing_anything(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/", {"file": SimpleUploadedFile("big.bin", self.DATA)}, follow=True
+        )
+        self.assertContains(response, "Недостаточно места в хранилище")
+        self.assertFalse(UploadFile.objects.exists())
+        self.assertFalse(Blob.objects.exists())
+
+
+# Транзакции здесь коммитятся по-настоящему: фоновые потоки выключены, иначе
+# они держали бы базу, пока тест ее очищает.
+@override_settings(
+    PREVIEW_WORKERS=0,
+    SEARCH_INDEX_WORKERS=0,
+    STORAGE_REAPER_WORKERS=0,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class BlobRollbackTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="rollback@example.com", username="rollback", password="secret"
+        )
+        self.client.force_login(self.user)
+        self.client.raise_request_exception = False
+
+    def test_blob_file_of_rolled_back_request_is_queued(self):
+        with mock.patch(
+            "uploader.views.schedule_preview", side_effect=RuntimeError("boom")
+        ):
+            response = self.client.post(
+                "/", {"file": SimpleUploadedFile("a.txt", b"rolled back")}
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Blob.objects.exists())
+        sha256 = hashlib.sha256(b"rolled back").hexdigest()
+        self.assertTrue(
+            StorageCleanup.objects.filter(path__contains=f"/{sha256}-").exists()
+        )
+
+    def test_committed_blob_file_is_kept(self):
+        self.client.post("/", {"file": SimpleUploadedFile("a.txt", b"kept")})
+        blob = Blob.objects.get()
+        self.assertFalse(StorageCleanup.objects.filter(path=blob.file.name).exists())
+
+
+@override_settings(UPLOAD_COMPRESSION="gzip", MEDIA_ROOT=tempfile.mkdtemp())
+class CompressionTests(TestCase):
+    CSV = b"".join(b"%d,name%d\n" % (i, i) for i in range(5000))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="gzip@example.com", username="gzip", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, data):
+        self.client.post("/", {"file": SimpleUploadedFile(name, data)})
+        return UploadFile.objects.select_related("blob").get(original_name=name)
+
+    def test_text_is_stored_compressed_and_served_both_ways(self):
+        upload = self.upload("data.csv", self.CSV)
+        self.assertEqual(upload.encoding, "gzip")
+        self.assertLess(upload.stored_size, len(self.CSV) // 2)
+
+        response = self.client.get(
+            upload.get_download_url(), HTTP_ACCEPT_ENCODING="gzip, deflate"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        body = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), self.CSV)
+
+        response = self.client.get(
+            upload.get_download_url(), HTTP_ACCEPT_ENCODING="identity"
+        )
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response["Content-Length"], str(len(self.CSV)))
+        self.assertEqual(b"".join(response.streaming_content), self.CSV)
+
+    def test_offload_backends_do_not_serve_compressed_blobs(self):
+        upload = self.upload("data.csv", self.CSV)
+        for backend in ["django", "sendfile", "x-accel-redirect", "x-sendfile"]:
+            with self.subTest(backend=backend), self.settings(DOWNLOAD_BACKEND=backend):
+                response = self.client.get(
+                    upload.get_download_url(), HTTP_ACCEPT_ENCODING="gzip"
+                )
+                self.assertNotIn("X-Accel-Redirect", response)
+                self.assertNotIn("X-Sendfile", response)
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                body = b"".join(response.streaming_content)
+                self.assertEqual(gzip.decompress(body), self.CSV)
+
+                response = self.client.get(
+                    upload.get_download_url(), HTTP_ACCEPT_ENCODING="identity"
+                )
+                self.assertNotIn("Content-Encoding", response)
+                self.assertEqual(b"".join(response.streaming_content), self.CSV)
+
+    def test_offload_backends_still_serve_plain_files(self):
+        upload = self.upload("archive.zip", b"PK\x03\x04" + self.CSV)
+        with self.settings(DOWNLOAD_BACKEND="x-accel-redirect"):
+            response = self.client.get(upload.get_download_url())
+        self.assertIn("X-Accel-Redirect", response)
+
+    def test_already_compressed_types_are_stored_as_is(self):
+        upload = self.upload("archive.zip", b"PK\x03\x04" + self.CSV)
+        self.assertEqual(upload.encoding, "")
+        response = self.client.get(
+            upload.get_download_url(), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertNotIn("Content-Encoding", response)
+
+
+@override_settings(
+    SEARCH_INDEX_WORKERS=0, PREVIEW_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp()
+)
+class FileSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="search@example.com", username="search", password="secret"
+        )
+        cls.other = CustomUser.objects.create_user(
+            email="other-search@example.com", username="other-search", password="x"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, data, user=None):
+        self.client.force_login(user or self.user)
+        self.client.post("/", {"file": SimpleUploadedFile(name, data)})
+        self.client.force_login(self.user)
+        return UploadFile.objects.get(original_name=name, user=user or self.user)
+
+    def test_text_is_indexed_in_background_and_found(self):
+        notes = self.upload("notes.txt", "Квартальный отчет по продажам".encode())
+        self.upload("photo.png", b"\x89PNG\r\n\x1a\n")
+        self.upload("secret.txt", "Квартальный отчет конкурента".encode(), self.other)
+        document = FileSearchDocument.objects.get(upload=notes)
+        self.assertEqual(document.status, FileSearchDocument.STATUS_PENDING)
+        self.assertEqual(FileSearchDocument.objects.count(), 2)
+
+        call_command("index_files", stdout=io.StringIO())
+        document.refresh_from_db()
+        self.assertEqual(document.status, FileSearchDocument.STATUS_READY)
+
+        files, has_next = search_files(self.user, "Квартальный")
+        self.assertEqual([file.pk for file in files], [notes.pk])
+        self.assertFalse(has_next)
+
+    def test_name_search_ranks_and_paginates(self):
+        for i in range(3):
+            self.upload(f"report-{i}.csv", b"a,b\n")
+        with self.settings(SEARCH_PAGE_SIZE=2):
+            response = self.client.get(
+                "/file/search/", {"q": "report", "format": "json"}
+            )
+            data = response.json()
+            self.assertTrue(data["has_next"])
+            self.assertEqual(len(data["files"]), 2)
+            self.assertIn("rank", data["files"][0])
+            data = self.client.get(
+                "/file/search/", {"q": "report", "page": 2, "format": "json"}
+            ).json()
+            self.assertEqual(len(data["files"]), 1)
+            self.assertFalse(data["has_next"])
+        self.assertEqual(search_files(self.user, "re"), ([], False))
+        response = self.client.get("/file/search/", {"q": "report"})
+        self.assertContains(response, "report-0.csv")
+
+
+@override_settings(SEARCH_INDEX_WORKERS=0, MEDIA_ROOT=tempfile.mkdtemp())
+class BackgroundWorkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="background@example.com", username="background", password="x"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_work_is_submitted_after_commit_when_workers_are_enabled(self):
+        executor = mock.Mock()
+        with mock.patch.object(previews.queue, "_get_executor", return_value=executor):
+            with self.settings(PREVIEW_WORKERS=2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        "/", {"file": SimpleUploadedFile("a.txt", b"first")}
+                    )
+                    executor.submit.assert_not_called()
+            preview = FilePreview.objects.get(upload__original_name="a.txt")
+            executor.submit.assert_called_once_with(
+                previews.queue._run, previews.process_preview, preview.pk
+            )
+
+            executor.reset_mock()
+            with self.settings(PREVIEW_WORKERS=0):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        "/", {"file": SimpleUploadedFile("b.txt", b"second")}
+                    )
+            executor.submit.assert_not_called()
+
+    def test_worker_command_moves_past_rows_claimed_elsewhere(self):
+        with self.settings(PREVIEW_WORKERS=0):
+            for name in ("a.txt", "b.txt", "c.txt"):
+                self.client.post("/", {"file": SimpleUploadedFile(name, b"x")})
+        # Превью, занятое другим воркером, остается pending: команда не
+        # должна выбирать его снова и снова.
+        with mock.patch(
+            "uploader.management.commands.generate_previews.process_preview"
+        ) as process:
+            call_command("generate_previews", "--batch-size=2", stdout=io.StringIO())
+        self.assertEqual(process.call_count, 3)
+        self.assertEqual(
+            FilePreview.objects.filter(status=FilePreview.STATUS_PENDING).count(), 3
+        )
+
+
+@override_settings(
+    SEARCH_INDEX_WORKERS=0,
+    PREVIEW_WORKERS=0,
+    STATS_LARGEST_FILES=2,
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class UserFileStatsTests(TestCase):
+    FIELDS = ["file_count", "total_size", "by_category", "by_month", "largest"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="stats@example.com", username="stats", password="secret"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertStatsUpToDate(self):
+        stats = UserFileStats.objects.get(pk=self.user.pk)
+        expected = UserFileStats.objects.compute([self.user.pk])[self.user.pk]
+        for field in self.FIELDS:
+            self.assertEqual(getattr(stats, field), getattr(expected, field), field)
+        return stats
+
+    def test_stats_follow_uploads_and_deletes(self):
+        self.client.post("/", {"file": SimpleUploadedFile("a.txt", b"a" * 10)})
+        data = self.client.get("/file/stats/").json()
+        self.assertEqual(data["file_count"], 1)
+        self.assertEqual(data["largest"][0]["name"], "a.txt")
+
+        self.client.post(
+            "/upload/bulk/",
+            {
+                "f1": SimpleUploadedFile("b.zip", b"PK\x03\x04" + b"b" * 100),
+                "f2": SimpleUploadedFile("c.txt", b"c" * 50),
+            },
+        )
+        stats = self.assertStatsUpToDate()
+        self.assertEqual([entry["name"] for entry in stats.largest], ["b.zip", "c.txt"])
+
+        UploadFile.objects.filter(original_name="b.zip").delete()
+        stats = self.assertStatsUpToDate()
+        self.assertEqual([entry["name"] for entry in stats.largest], ["c.txt", "a.txt"])
+        self.assertNotIn("archive", stats.by_category)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/file/stats/")
+        tables = [q["sql"] for q in queries if "uploader_" in q["sql"]]
+        self.assertEqual(len(tables), 1, tables)
+        self.assertIn('FROM "uploader_userfilestats"', tables[0])
+
+    def test_rebuild_command_repairs_drift(self):
+        self.client.post("/", {"file": SimpleUploadedFile("a.txt", b"a" * 10)})
+        self.client.get("/file/stats/")
+        UserFileStats.objects.filter(pk=self.user.pk).update(
+            file_count=5, by_category={}
+        )
+        call_command("rebuild_file_stats", stdout=io.StringIO())
+        self.assertStatsUpToDate()
+
+
+class UploadFileQueryPlanTests(TestCase):
+    """
+    Проверяет, что основные выборки UploadFile идут по индексам без сортировки
+    результата. Если изменение запроса или индексов вернет полный проход по
+    таблице и сортировку, тесты упадут.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email=f"user{i}@example.com", username=f"user{i}")
+            for i in range(USERS)
+        )
+        now = timezone.now()
+        files = []
+        for user in users:
+            for i in range(FILES_PER_USER):
+                n = len(files)
+                content_type = CONTENT_TYPES[n % len(CONTENT_TYPES)]
+                extension = EXTENSIONS[n % len(EXTENSIONS)]
+                files.append(
+                    UploadFile(
+                        user=user,
+                        file=f"uploads/{n}.bin",
+                        original_name=f"file{n}.bin",
+                        slug=f"file{n}",
+                        size=n,
+                        content_type=content_type,
+                        extension=extension,
+                        category=classify_file(content_type, extension),
+                    )
+                )
+        UploadFile.objects.bulk_create(files, batch_size=2000)
+        # Разносим даты и делаем часть из них одинаковыми, как при пакетной загрузке.
+        for i, pk in enumerate(UploadFile.objects.values_list("pk", flat=True)):
+            if i % 500 == 0:
+                UploadFile.objects.filter(pk__gte=pk, pk__lt=pk + 500).update(
+                    uploaded_at=now - timedelta(minutes=i)
+                )
+        FilePreview.objects.bulk_create(
+            FilePreview(upload_id=pk, status=FilePreview.STATUS_READY)
+            for pk in UploadFile.objects.values_list("pk", flat=True)[:5000]
+        )
+        cls.user = users[USERS // 2]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertIndexScanWithoutSort(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+        table = queryset.model._meta.db_table
+        if connection.vendor == "postgresql":
+            self.assertNotIn(f"Seq Scan on {table}", plan, plan)
+            self.assertNotRegex(plan, r"(?m)^\s*(->\s*)?(Incremental )?Sort\b", plan)
+        elif connection.vendor == "sqlite":
+            self.assertNotRegex(plan, rf"SCAN {table}(?! USING)", plan)
+            self.assertNotIn("TEMP B-TREE", plan, plan)
+
+    def test_first_page_of_user_files(self):
+        queryset = UploadFile.objects.filter(user=self.user).order_by(
+            "-uploaded_at", "-id"
+        )[:51]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_user_recent_idx")
+
+    def test_deep_keyset_page_of_user_files(self):
+        files = UploadFile.objects.filter(user=self.user)
+        _, cursor = keyset_page(files, page_size=FILES_PER_USER - 10)
+        self.assertIsNotNone(cursor)
+        queryset = keyset_queryset(files, cursor)[:51]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_user_recent_idx")
+
+    def test_keyset_pages_cover_all_files_once(self):
+        files = UploadFile.objects.filter(user=self.user)
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(files, cursor=cursor, page_size=7)
+            seen.extend(file.pk for file in page)
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), FILES_PER_USER)
+        self.assertEqual(len(set(seen)), FILES_PER_USER)
+
+    @skipUnless(
+        connection.vendor == "postgresql", "триграммный индекс есть только в PostgreSQL"
+    )
+    def test_filename_search(self):
+        queryset = UploadFile.objects.filter(
+            user=self.user, original_name__icontains="file12"
+        )
+        plan = queryset.explain()
+        self.assertIn("uploadfile_name_trgm_idx", plan, plan)
+        self.assertNotIn("Seq Scan on uploader_uploadfile", plan, plan)
+
+    def test_admin_changelist(self):
+        queryset = UploadFile.objects.order_by("-uploaded_at", "-id")[:100]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_recent_idx")
+
+    def test_admin_content_type_filter(self):
+        queryset = UploadFile.objects.filter(content_type="video/mp4").order_by(
+            "-uploaded_at", "-id"
+        )[:100]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_ctype_recent_idx")
+
+    def test_admin_extension_filter(self):
+        queryset = UploadFile.objects.filter(extension="exe").order_by(
+            "-uploaded_at", "-id"
+        )[:100]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_ext_recent_idx")
+
+    def test_category_filter_of_user_files(self):
+        queryset = UploadFile.objects.filter(user=self.user, category="video").order_by(
+            "-uploaded_at", "-id"
+        )[:51]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_user_cat_idx")
+
+    def test_admin_category_filter(self):
+        queryset = UploadFile.objects.filter(category="archive").order_by(
+            "-uploaded_at", "-id"
+        )[:100]
+        self.assertIndexScanWithoutSort(queryset, "uploadfile_cat_recent_idx")
+
+    def test_pending_previews_queue(self):
+        queryset = FilePreview.objects.filter(
+            status=FilePreview.STATUS_PENDING
+        ).order_by("pk")[:100]
+        self.assertIndexScanWithoutSort(queryset, "filepreview_pending_idx")
+
+
+@skipUnless(
+    boto3 is not None and os.getenv("S3_TEST_ENDPOINT_URL"),
+    "нужны boto3 и S3-совместимый сервер (MinIO) в S3_TEST_ENDPOINT_URL",
+)
+class S3StorageTests(TestCase):
+    """
+    Проверяет S3Storage на локальном S3-совместимом сервере, например:
+    docker run -p 9000:9000 minio/minio server /data
+    S3_TEST_ENDPOINT_URL=http://127.0.0.1:9000 python manage.py test uploader
+    """
+
+    def setUp(self):
+        self.storage = S3Storage(
+            bucket_name=f"fileflow-test-{secrets.token_hex(4)}",
+            endpoint_url=os.getenv("S3_TEST_ENDPOINT_URL"),
+            region_name="us-east-1",
+            access_key=os.getenv("S3_TEST_ACCESS_KEY_ID", "minioadmin"),
+            secret_key=os.getenv("S3_TEST_SECRET_ACCESS_KEY", "minioadmin"),
+            addressing_style="path",
+            multipart_threshold=5 * 1024 * 1024,
+            multipart_chunksize=5 * 1024 * 1024,
+        )
+        self.storage.client.create_bucket(Bucket=self.storage.bucket_name)
+
+    def tearDown(self):
+        client = self.storage.client
+        objects = client.list_objects_v2(Bucket=self.storage.bucket_name)
+        for item in objects.get("Contents", []):
+            client.delete_object(Bucket=self.storage.bucket_name, Key=item["Key"])
+        client.delete_bucket(Bucket=self.storage.bucket_name)
+
+    def test_multipart_upload_and_ranged_reads(self):
+        data = os.urandom(11 * 1024 * 1024)
+        name = self.storage.save("uploads/big.bin", ContentFile(data))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.size(name), len(data))
+        with self.storage.open(name) as fileobj:
+            fileobj.seek(6 * 1024 * 1024)
+            self.assertEqual(fileobj.read(100), data[6 * 1024 * 1024 :][:100])
+            fileobj.seek(10)
+            self.assertEqual(fileobj.read(10), data[10:20])
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_presigned_url_overrides_response_headers(self):
+        name = self.storage.save("uploads/a.txt", ContentFile(b"hello"))
+        url = self.storage.url(
+            name, response_headers={"Content-Disposition": "attachment"}
+        )
+        self.assertIn("X-Amz-Signature=", url)
+        self.assertIn("response-content-disposition=attachment", url)
@@ -1,17 +1,54 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Под ASGI-сервером (uvicorn, daphne) списки, просмотр и скачивание
+# обслуживают асинхронные представления.
+if settings.ASYNC_VIEWS:
+    all_file_details = views.all_file_details_async
+    file_list_page = views.file_list_page_async
+    file_detail = views.file_detail_async
+    file_download = views.file_download_async
+else:
+    all_file_details = views.all_file_details
+    file_list_page = views.file_list_page
+    file_detail = views.file_detail
+    file_download = views.file_download
+
 app_name = "uploader"
 
 urlpatterns = [
     path("", views.uploader, name="uploader"),
-    path("file/all", views.all_file_details, name="all_file_details"),
+    path("upload/bulk/", views.bulk_upload, name="bulk_upload"),
+    path("upload/", views.chunked_upload_init, name="chunked_upload_init"),
+    path(
+        "upload/<slug:upload_id>/",
+        views.chunked_upload_chunk,
+        name="chunked_upload_chunk",
+    ),
+    path(
+        "upload/<slug:upload_id>/complete/",
+        views.chunked_upload_complete,
+        name="chunked_upload_complete",
+    ),
+    path("file/all", all_file_details, name="all_file_details"),
+    path("file/page/", file_list_page, name="file_list_page"),
+    path("file/delete/", views.bulk_delete, name="bulk_delete"),
+    path("file/search/", views.file_search, name="file_search"),
+    path("file/stats/", views.file_stats, name="file_stats"),
     path(
         "file/all/<slug:slug>/delete/",
         views.all_file_details_delete,
         name="all_file_details_delete",
     ),
-    path("file/<slug:slug>/", views.file_detail, name="file_detail"),
-    path("file/<slug:slug>/download/", views.file_download, name="file_download"),
+    path("file/<slug:slug>/", file_detail, name="file_detail"),
+    path("file/<slug:slug>/download/", file_download, name="file_download"),
+    path("file/<slug:slug>/inline/", views.file_inline, name="file_inline"),
+    path("file/<slug:slug>/preview/", views.file_preview, name="file_preview"),
+    path(
+        "file/<slug:slug>/preview/status/",
+        views.file_preview_status,
+        name="file_preview_status",
+    ),
     path("file/<slug:slug>/delete/", views.file_delete, name="file_delete"),
 ]
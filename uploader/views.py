@@ -1,9 +1,30 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import FileResponse, Http404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.template.defaultfilters import filesizeformat
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.clickjacking import xframe_options_sameorigin
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
 from django.contrib.auth.decorators import login_required
-from .models import UploadFile
+from .cleanup import schedule_reap
+from .downloads import aserve_file, serve_file
+from .models import (
+    CATEGORY_CHOICES,
+    CATEGORY_LABELS,
+    UploadFile,
+    ChunkedUpload,
+    FilePreview,
+    UserFileStats,
+)
+from .pagination import akeyset_page, keyset_page
+from .previews import schedule_preview, schedule_previews
+from .search import MIN_QUERY_LENGTH, schedule_indexing, search_files
 
 
 @login_required
@@ -11,45 +32,298 @@ def uploader(request):
     if request.method == "POST":
         uploaded_file = request.FILES.get("file")
         if uploaded_file:
-            max_size_bytes = request.user.max_file_size()
+            max_size_bytes = request.entitlement.max_file_size
             if uploaded_file.size > max_size_bytes:
                 messages.error(
                     request,
                     f"Файл превышает допустимый размер {max_size_bytes // (1024*1024)} МБ",
                 )
                 return redirect("uploader:uploader")
+            if not request.entitlement.has_storage_for(
+                request.user, uploaded_file.size
+            ):
+                messages.error(request, _storage_full_message(request))
+                return redirect("uploader:uploader")
             obj = UploadFile(user=request.user, file=uploaded_file)
             obj.save()
+            schedule_preview(obj)
+            schedule_indexing([obj])
             messages.success(request, "Файл успешно загружен!")
             return redirect("uploader:uploader")
+        if getattr(request, "rejected_uploads", None):
+            if (
+                request.entitlement.storage_left(request.user)
+                < request.entitlement.max_file_size
+            ):
+                messages.error(request, _storage_full_message(request))
+            else:
+                messages.error(
+                    request,
+                    f"Файл превышает допустимый размер {request.entitlement.max_file_size_mb} МБ",
+                )
+            return redirect("uploader:uploader")
         messages.error(request, "Вы не выбрали файл!")
-    files = UploadFile.objects.filter(user=request.user).order_by("-uploaded_at")
-    return render(request, "uploader/uploader.html", {"files": files})
+    files, next_cursor = keyset_page(
+        UploadFile.objects.filter(user=request.user),
+        page_size=settings.FILE_LIST_PAGE_SIZE,
+    )
+    return render(
+        request,
+        "uploader/uploader.html",
+        {"files": files, "next_cursor": next_cursor},
+    )
+
+
+def _bulk_upload_name(request, field_name, uploaded, single):
+    # Путь внутри выбранной папки (webkitRelativePath) приходит отдельным
+    # полем path_<поле>: из имени файла в multipart Django оставляет только basename.
+    path = request.POST.get(f"path_{field_name}", "") if single else ""
+    return (path.strip().lstrip("/\\") or uploaded.name)[:255]
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_upload(request):
+    # Тело разбирается при первом обращении к FILES: только после этого
+    # известно, какие файлы обработчик загрузки отбросил.
+    uploaded_lists = list(request.FILES.lists())
+    max_size_bytes = request.entitlement.max_file_size
+    storage_left = request.entitlement.storage_left(request.user)
+    if storage_left < max_size_bytes:
+        rejected_error = _storage_full_message(request)
+    else:
+        rejected_error = f"Файл превышает допустимый размер {request.entitlement.max_file_size_mb} МБ"
+    # Эти файлы обработчик загрузки отбросил, не дочитав до конца.
+    results = [
+        {"name": name, "status": "error", "error": rejected_error}
+        for name in getattr(request, "rejected_uploads", [])
+    ]
+    objs = []
+    for field_name, uploaded_files in uploaded_lists:
+        for uploaded in uploaded_files:
+            name = _bulk_upload_name(
+                request, field_name, uploaded, len(uploaded_files) == 1
+            )
+            if uploaded.size > max_size_bytes:
+                error = f"Файл превышает допустимый размер {max_size_bytes // (1024*1024)} МБ"
+            elif uploaded.size > storage_left:
+                error = _storage_full_message(request)
+            else:
+                error = None
+            if error:
+                results.append({"name": name, "status": "error", "error": error})
+                continue
+            storage_left -= uploaded.size
+            objs.append(
+                UploadFile(user=request.user, file=uploaded, original_name=name)
+            )
+
+    if not objs and not results:
+        return JsonResponse({"error": "Вы не выбрали файл!"}, status=400)
+    if objs:
+        with transaction.atomic():
+            UploadFile.prepare_files(objs)
+            UploadFile.objects.bulk_create(objs)
+            request.user.add_storage_usage(sum(obj.size or 0 for obj in objs))
+            UserFileStats.objects.record_uploads(objs)
+            schedule_previews(objs)
+            schedule_indexing(objs)
+    results.extend(
+        {
+            "name": obj.original_name,
+            "status": "ok",
+            "slug": obj.slug,
+            "size": obj.size,
+            "url": obj.get_view_url(),
+        }
+        for obj in objs
+    )
+    return JsonResponse(
+        {"files": results, "uploaded": len(objs), "failed": len(results) - len(objs)},
+        status=201 if objs else 400,
+    )
+
+
+def _get_category(data):
+    # Неизвестная категория означает «без фильтра».
+    category = data.get("category", "")
+    return category if category in CATEGORY_LABELS else ""
+
+
+def _user_files(user, category):
+    files = UploadFile.objects.filter(user=user)
+    if category:
+        files = files.filter(category=category)
+    return files
+
+
+def _file_list_context(files, next_cursor, category):
+    return {
+        "files": files,
+        "next_cursor": next_cursor,
+        "categories": CATEGORY_CHOICES,
+        "category": category,
+    }
 
 
 @login_required
 def all_file_details(request):
-    files = UploadFile.objects.filter(user=request.user).order_by("-uploaded_at")
-    return render(request, "uploader/all_file_details.html", {"files": files})
+    category = _get_category(request.GET)
+    files, next_cursor = keyset_page(
+        _user_files(request.user, category),
+        page_size=settings.FILE_LIST_PAGE_SIZE,
+    )
+    return render(
+        request,
+        "uploader/all_file_details.html",
+        _file_list_context(files, next_cursor, category),
+    )
+
+
+@login_required
+def file_list_page(request):
+    try:
+        files, next_cursor = keyset_page(
+            _user_files(request.user, _get_category(request.GET)),
+            cursor=request.GET.get("cursor"),
+            page_size=settings.FILE_LIST_PAGE_SIZE,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if request.GET.get("format") == "json":
+        return _file_list_json(files, next_cursor)
+    return _file_list_fragment(request, files, next_cursor)
+
+
+def _file_json(file):
+    return {
+        "slug": file.slug,
+        "original_name": file.original_name,
+        "size": file.size,
+        "human_size": file.human_size,
+        "category": file.file_category,
+        "category_code": file.category,
+        "uploaded_at": file.uploaded_at.isoformat(),
+        "url": file.get_view_url(),
+        "download_url": file.get_download_url(),
+    }
+
+
+def _file_list_json(files, next_cursor):
+    return JsonResponse(
+        {"files": [_file_json(file) for file in files], "next_cursor": next_cursor}
+    )
+
+
+def _file_list_fragment(request, files, next_cursor):
+    response = render(
+        request, "uploader/file_list_items.html", {"files": files, "selectable": True}
+    )
+    if next_cursor:
+        response["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@login_required
+def file_search(request):
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    files, has_next = search_files(request.user, query, page)
+    if request.GET.get("format") == "json":
+        return JsonResponse(
+            {
+                "query": query,
+                "page": page,
+                "has_next": has_next,
+                "files": [
+                    {**_file_json(file), "rank": round(file.rank, 4)} for file in files
+                ],
+            }
+        )
+    return render(
+        request,
+        "uploader/search.html",
+        {
+            "query": query,
+            "files": files,
+            "page": page,
+            "has_next": has_next,
+            "min_query_length": MIN_QUERY_LENGTH,
+        },
+    )
+
+
+@login_required
+def file_stats(request):
+    return JsonResponse(UserFileStats.objects.for_user(request.user).as_dict())
 
 
 @login_required
 def file_detail(request, slug):
-    file = get_object_or_404(UploadFile, slug=slug)
+    file = get_object_or_404(
+        UploadFile.objects.select_related("preview"), slug=slug, user=request.user
+    )
+    if file.needs_preview and not hasattr(file, "preview"):
+        # Файлы, загруженные до появления превью, ставим в очередь при просмотре.
+        file.preview = schedule_preview(file)
     return render(request, "uploader/file_detail.html", {"file": file})
 
 
 @login_required
-def file_download(request, slug):
-    file = get_object_or_404(UploadFile, slug=slug)
-    if (
-        not file.file
-        or not file.file.path
-        or not file.file.storage.exists(file.file.name)
-    ):
+def file_preview(request, slug):
+    preview = get_object_or_404(
+        FilePreview,
+        upload__slug=slug,
+        upload__user=request.user,
+        status=FilePreview.STATUS_READY,
+    )
+    if not preview.image:
+        raise Http404("Превью не найдено!")
+    response = FileResponse(preview.image.open("rb"))
+    response["Cache-Control"] = "private, max-age=86400"
+    return response
+
+
+@login_required
+def file_preview_status(request, slug):
+    file = get_object_or_404(
+        UploadFile.objects.select_related("preview"), slug=slug, user=request.user
+    )
+    preview = getattr(file, "preview", None)
+    if preview is None or preview.is_pending:
+        return JsonResponse({"status": FilePreview.STATUS_PENDING})
+    html = render_to_string(
+        "uploader/file_preview.html", {"file": file, "preview": preview}, request
+    )
+    return JsonResponse({"status": preview.status, "html": html})
+
+
+def _get_stored_file(request, slug):
+    file = get_object_or_404(
+        UploadFile.objects.select_related("blob"), slug=slug, user=request.user
+    )
+    if not file.file or not file.file.storage.exists(file.file.name):
         raise Http404("Файл не найден!")
-    response = FileResponse(open(file.file.path, "rb"))
-    response["Content-Disposition"] = f'attachment; filename="{file.original_name}"'
+    return file
+
+
+@login_required
+def file_download(request, slug):
+    return serve_file(request, _get_stored_file(request, slug))
+
+
+@login_required
+@xframe_options_sameorigin
+def file_inline(request, slug):
+    file = _get_stored_file(request, slug)
+    if not file.is_previewable:
+        raise Http404("Превью недоступно для этого типа файла.")
+    response = serve_file(request, file, as_attachment=False)
+    if not file.is_pdf:
+        response["Content-Security-Policy"] = "sandbox"
     return response
 
 
@@ -57,7 +331,6 @@ def file_download(request, slug):
 @require_http_methods(["POST"])
 def file_delete(request, slug):
     file = get_object_or_404(UploadFile, slug=slug, user=request.user)
-    file.file.delete(save=False)
     file.delete()
     messages.success(request, "Файл успешно удален!")
     return redirect("uploader:uploader")
@@ -67,7 +340,249 @@ def file_delete(request, slug):
 @require_http_methods(["POST"])
 def all_file_details_delete(request, slug):
     file = get_object_or_404(UploadFile, slug=slug, user=request.user)
-    file.file.delete(save=False)
     file.delete()
     messages.success(request, "Файл успешно удален!")
     return redirect("uploader:all_file_details")
+
+
+def _wants_json(request):
+    # accepts("text/html") истинно и для "*/*", который по умолчанию шлют
+    # fetch и XHR, поэтому JSON выбираем только по явному запросу.
+    return (
+        "application/json" in request.headers.get("Accept", "")
+        or request.headers.get("X-Requested-With") == "XMLHttpRequest"
+    )
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_delete(request):
+    # «Удалить все» на отфильтрованной странице удаляет только эту категорию.
+    category = _get_category(request.POST)
+    files = _user_files(request.user, category)
+    if request.POST.get("all") != "1":
+        files = files.filter(slug__in=request.POST.getlist("slugs"))
+    _, deleted_by_model = files.delete()
+    deleted = deleted_by_model.get(UploadFile._meta.label, 0)
+    if not _wants_json(request):
+        if deleted:
+            messages.success(request, f"Удалено файлов: {deleted}")
+        else:
+            messages.error(request, "Вы не выбрали файлы!")
+        url = reverse("uploader:all_file_details")
+        return redirect(f"{url}?category={category}" if category else url)
+    return JsonResponse({"deleted": deleted}, status=200 if deleted else 400)
+
+
+def _storage_full_message(request):
+    entitlement = request.entitlement
+    return (
+        "Недостаточно места в хранилище: свободно "
+        f"{filesizeformat(entitlement.storage_left(request.user))} "
+        f"из {filesizeformat(entitlement.storage_quota)}"
+    )
+
+
+def _storage_full_error(request):
+    return JsonResponse({"error": _storage_full_message(request)}, status=413)
+
+
+def _size_limit_error(max_size_bytes):
+    return JsonResponse(
+        {
+            "error": f"Файл превышает допустимый размер {max_size_bytes // (1024*1024)} МБ"
+        },
+        status=413,
+    )
+
+
+def _chunked_upload_state(upload):
+    return {
+        "upload_id": upload.upload_id,
+        "offset": upload.offset,
+        "total_size": upload.total_size,
+    }
+
+
+@login_required
+@require_http_methods(["POST"])
+def chunked_upload_init(request):
+    filename = request.POST.get("filename", "").strip()
+    try:
+        total_size = int(request.POST.get("size", ""))
+    except ValueError:
+        return JsonResponse({"error": "Не указан размер файла!"}, status=400)
+    if not filename or total_size <= 0:
+        return JsonResponse({"error": "Вы не выбрали файл!"}, status=400)
+    max_size_bytes = request.entitlement.max_file_size
+    if total_size > max_size_bytes:
+        return _size_limit_error(max_size_bytes)
+    if not request.entitlement.has_storage_for(request.user, total_size):
+        return _storage_full_error(request)
+    upload = ChunkedUpload.objects.create(
+        user=request.user, original_name=filename, total_size=total_size
+    )
+    # Заодно убираем брошенные загрузки: отдельный планировщик не обязателен.
+    schedule_reap()
+    return JsonResponse(_chunked_upload_state(upload), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD", "PUT", "DELETE"])
+def chunked_upload_chunk(request, upload_id):
+    if request.method in ("GET", "HEAD"):
+        upload = get_object_or_404(
+            ChunkedUpload, upload_id=upload_id, user=request.user
+        )
+        response = JsonResponse(_chunked_upload_state(upload))
+        response["Upload-Offset"] = upload.offset
+        return response
+
+    # Блокировка строки сериализует параллельные PUT одной загрузки.
+    upload = get_object_or_404(
+        ChunkedUpload.objects.select_for_update(),
+        upload_id=upload_id,
+        user=request.user,
+    )
+    if request.method == "DELETE":
+        upload.discard()
+        upload.delete()
+        return HttpResponse(status=204)
+
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+        length = int(request.headers.get("Content-Length", ""))
+    except ValueError:
+        return JsonResponse(
+            {"error": "Требуются заголовки Upload-Offset и Content-Length!"},
+            status=400,
+        )
+    current_offset = upload.offset
+    if offset != current_offset:
+        return JsonResponse(
+            {"error": "Неверное смещение части!", **_chunked_upload_state(upload)},
+            status=409,
+        )
+    if length > settings.FILE_UPLOAD_CHUNK_MAX_SIZE:
+        return JsonResponse({"error": "Слишком большая часть файла!"}, status=413)
+    max_size_bytes = request.entitlement.max_file_size
+    if offset + length > min(upload.total_size, max_size_bytes):
+        upload.discard()
+        upload.delete()
+        return _size_limit_error(max_size_bytes)
+    # Место могли занять другие загрузки, пока эта шла по частям.
+    if not request.entitlement.has_storage_for(request.user, upload.total_size):
+        return _storage_full_error(request)
+
+    upload.append_chunk(request, length)
+    upload.save(update_fields=["updated_at", "expires_at"])
+    response = JsonResponse(_chunked_upload_state(upload))
+    response["Upload-Offset"] = upload.offset
+    return response
+
+
+@login_required
+@require_http_methods(["POST"])
+def chunked_upload_complete(request, upload_id):
+    upload = get_object_or_404(
+        ChunkedUpload.objects.select_for_update(),
+        upload_id=upload_id,
+        user=request.user,
+    )
+    if not upload.is_complete:
+        return JsonResponse(
+            {"error": "Файл загружен не полностью!", **_chunked_upload_state(upload)},
+            status=409,
+        )
+    if not request.entitlement.has_storage_for(request.user, upload.total_size):
+        return _storage_full_error(request)
+    with upload.open_staged() as staged:
+        obj = UploadFile(user=request.user, file=staged)
+        obj.save()
+    schedule_preview(obj)
+    schedule_indexing([obj])
+    upload.discard()
+    upload.delete()
+    return JsonResponse(
+        {
+            "slug": obj.slug,
+            "original_name": obj.original_name,
+            "size": obj.size,
+            "url": obj.get_view_url(),
+        },
+        status=201,
+    )
+
+
+# Асинхронные варианты просмотра и скачивания для ASGI (ASYNC_VIEWS=1, см.
+# uploader.urls): запросы идут через асинхронный ORM, файл читается без
+# блокировки цикла событий, и медленный клиент не занимает поток. Шаблоны
+# рендерятся в потоке. ATOMIC_REQUESTS с async-представлениями несовместим,
+# а транзакция этим представлениям и не нужна.
+
+
+async def _aget_stored_file(request, slug):
+    file = await aget_object_or_404(
+        UploadFile.objects.select_related("blob"),
+        slug=slug,
+        user=await request.auser(),
+    )
+    if not file.file or not await asyncio.to_thread(
+        file.file.storage.exists, file.file.name
+    ):
+        raise Http404("Файл не найден!")
+    return file
+
+
+@transaction.non_atomic_requests
+@login_required
+async def all_file_details_async(request):
+    user = await request.auser()
+    category = _get_category(request.GET)
+    files, next_cursor = await akeyset_page(
+        _user_files(user, category),
+        page_size=settings.FILE_LIST_PAGE_SIZE,
+    )
+    return await sync_to_async(render)(
+        request,
+        "uploader/all_file_details.html",
+        _file_list_context(files, next_cursor, category),
+    )
+
+
+@transaction.non_atomic_requests
+@login_required
+async def file_list_page_async(request):
+    user = await request.auser()
+    try:
+        files, next_cursor = await akeyset_page(
+            _user_files(user, _get_category(request.GET)),
+            cursor=request.GET.get("cursor"),
+            page_size=settings.FILE_LIST_PAGE_SIZE,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if request.GET.get("format") == "json":
+        return _file_list_json(files, next_cursor)
+    return await sync_to_async(_file_list_fragment)(request, files, next_cursor)
+
+
+@transaction.non_atomic_requests
+@login_required
+async def file_detail_async(request, slug):
+    file = await aget_object_or_404(
+        UploadFile.objects.select_related("preview"),
+        slug=slug,
+        user=await request.auser(),
+    )
+    if file.needs_preview and not hasattr(file, "preview"):
+        file.preview = await sync_to_async(schedule_preview)(file)
+    return await sync_to_async(render)(
+        request, "uploader/file_detail.html", {"file": file}
+    )
+
+
+@transaction.non_atomic_requests
+@login_required
+async def file_download_async(request, slug):
+    return await aserve_file(request, await _aget_stored_file(request, slug))